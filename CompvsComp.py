@@ -1,138 +1,117 @@
-from copy import deepcopy
-import random
+import os
 
+from endgame import ENDGAME_PATH, EndgameDatabase
+from engine import BitboardRandomEvalConnectFour, RandomEvalConnectFour
+from mcts import MCTS
+from opening_book import BOOK_PATH, OpeningBook
+from parallel import ParallelSearch
+from records import GameWriter
+from stats import SearchStats
+from transposition import TranspositionTable
 
-class ConnectFour:
-    rows = 6
-    columns = 7
 
-    def __init__(self):
-        self.board = [[' '] * self.columns for _ in range(self.rows)]
+def search_best_move(game, is_maximizing):
+    if tree_search is not None:
+        return tree_search.search(game, is_maximizing, playouts=MCTS_PLAYOUTS)
 
-    def check_win(self, symbol):
-        # Horizontally
-        for row in range(len(self.board)):
-            for col in range(len(self.board[0]) - 3):
-                if all(self.board[row][col + i] == symbol for i in range(4)):
-                    return True
+    if search_pool is not None:
+        # The search runs in the worker processes, which the stats leave out
+        return search_pool.minimax(game, is_maximizing, 4)
 
-        # Vertically
-        for row in range(len(self.board) - 3):
-            for col in range(len(self.board[0])):
-                if all(self.board[row + i][col] == symbol for i in range(4)):
-                    return True
+    return game.minimax(is_maximizing, 4, -float('inf'), float('inf'))
 
-        # Diagonally in \ direction
-        for row in range(len(self.board) - 3):
-            for col in range(len(self.board[0]) - 3):
-                if all(self.board[row + i][col + i] == symbol for i in range(4)):
-                    return True
 
-        # Diagonally in / direction
-        for row in range(len(self.board) - 3):
-            for col in range(3, len(self.board[0])):
-                if all(self.board[row + i][col - i] == symbol for i in range(4)):
-                    return True
+def get_best_move(game, is_maximizing):
+    if opening_book is not None:
+        entry = opening_book.lookup(game)
+        if entry is not None:
+            return entry[1]
 
-        return False
+    if STATS_PATH is None:
+        return search_best_move(game, is_maximizing)[1]
 
-    def select_space(self, column, symbol):
-        for row in range(len(self.board) - 1, -1, -1):
-            if self.board[row][column] == ' ':
-                self.board[row][column] = symbol
-                return True
+    game.stats = SearchStats()
+    game.stats.start(game)
+    result = search_best_move(game, is_maximizing)
+    game.stats.finish(game, is_maximizing, result)
+    game.stats.write(STATS_PATH)
+    game.stats = None
 
-        return False
+    return result[1]
 
-    def board_full(self):
-        for row in self.board:
-            if ' ' in row:
-                return False
 
-        return True
+# Search both computers play with: 'minimax' to depth 4 or 'mcts' for Monte
+# Carlo tree search with MCTS_PLAYOUTS playouts a move
+SEARCH = 'minimax'
+MCTS_PLAYOUTS = 2000
 
-    def print_board(self):
-        for row in self.board:
-            print(" | ".join(row))
-        print("--------------------------")
-        print()
+USE_BITBOARD = True
+Engine = BitboardRandomEvalConnectFour if USE_BITBOARD else RandomEvalConnectFour
 
-    def game_over(self):
-        if self.check_win('X') or self.check_win('O') or self.board_full():
-            return True
+# Memory cap for the transposition table shared by every game, 0 disables it
+TT_MEGABYTES = 16
 
-        return False
+# Processes searching the root moves and their replies in parallel, 1
+# searches in this process
+SEARCH_WORKERS = 1
 
-    def evaluate_board(self):
-        if self.check_win('X'):
-            return float('inf')
+# JSON lines file the search stats of every move are appended to, None keeps
+# them off
+STATS_PATH = None
 
-        if self.check_win('O'):
-            return -float('inf')
+# Game record file the finished game is appended to, None keeps no record
+RECORD_PATH = None
 
-        return self.random_eval()
 
-    def random_eval(self):
-        return random.randint(-100, 100)
+if __name__ == '__main__':
+    if TT_MEGABYTES:
+        Engine.tt = TranspositionTable(TT_MEGABYTES)
 
-    def minimax(self, is_maximizing, depth, alpha, beta):
-        if self.game_over() or depth == 0:
-            return [self.evaluate_board(), '']
+    search_pool = ParallelSearch(SEARCH_WORKERS) if SEARCH_WORKERS > 1 else None
 
-        best_move = ''
-        if is_maximizing:
-            best_value = -float('inf')
+    # One tree for both sides, each search carrying on from the last
+    tree_search = MCTS() if SEARCH == 'mcts' else None
+
+    # Searched opening moves written by opening_book.py, used when the file exists
+    opening_book = OpeningBook() if os.path.exists(BOOK_PATH) else None
+
+    # Solved endgames written by endgame.py, used when the file exists
+    if os.path.exists(ENDGAME_PATH):
+        Engine.endgame = EndgameDatabase()
+
+    game = Engine()
+    comp1Turn = True
+    moves = []
+
+    while not game.board_full():
+        game.print_board()
+        if comp1Turn:
             symbol = 'X'
+            best_move = get_best_move(game, True)
+            game.select_space(best_move, symbol)
+            comp1Turn = not comp1Turn
+            moves.append(best_move)
+
+            if game.check_win(symbol):
+                game.print_board()
+                print(f'{symbol} wins')
+                break
         else:
-            best_value = float('inf')
             symbol = 'O'
+            best_move = get_best_move(game, False)
+            game.select_space(best_move, symbol)
+            comp1Turn = not comp1Turn
+            moves.append(best_move)
+
+            if game.check_win(symbol):
+                game.print_board()
+                print(f'{symbol} wins')
+                break
 
-        for col in range(len(self.board[0])):
-            new_board = deepcopy(self)
-            if new_board.select_space(col, symbol):
-                value = new_board.minimax(not is_maximizing, depth - 1, alpha, beta)[0]
-                if is_maximizing:
-                    if value >= best_value:
-                        best_value = value
-                        best_move = col
-                        alpha = max(alpha, best_value)
-                else:
-                    if value <= best_value:
-                        best_value = value
-                        best_move = col
-                        beta = min(beta, best_value)
-                if alpha >= beta:
-                    break
-
-        return [best_value, best_move]
-
-
-game = ConnectFour()
-comp1Turn = True
-
-while not game.board_full():
-    game.print_board()
-    if comp1Turn:
-        symbol = 'X'
-        best_move = game.minimax(True, 4, -float('inf'), float('inf'))[1]
-        game.select_space(best_move, symbol)
-        comp1Turn = not comp1Turn
-
-        if game.check_win(symbol):
-            game.print_board()
-            print(f'{symbol} wins')
-            break
     else:
-        symbol = 'O'
-        best_move = game.minimax(False, 4, -float('inf'), float('inf'))[1]
-        game.select_space(best_move, symbol)
-        comp1Turn = not comp1Turn
-
-        if game.check_win(symbol):
-            game.print_board()
-            print(f'{symbol} wins')
-            break
-
-else:
-    game.print_board()
-    print('Its a Tie')
+        game.print_board()
+        print('Its a Tie')
+
+    if RECORD_PATH is not None:
+        with GameWriter(RECORD_PATH) as writer:
+            writer.add(moves, game.winner or '', f'CompvsComp {SEARCH} bitboard={USE_BITBOARD}')
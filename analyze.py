@@ -0,0 +1,117 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import argparse
+import json
+import os
+import sys
+
+from bitboard import COLUMN_NAMES
+from engine import BitboardConnectFour
+from search import iterative_deepening
+from stats import SearchStats, json_number
+from transposition import TranspositionTable
+
+# Search settings and tables of this worker process, set by init_worker
+_settings = None
+_tt = None
+
+
+def init_worker(depth, time_budget, tt_megabytes):
+    global _settings, _tt
+    _settings = [depth, time_budget]
+    _tt = TranspositionTable(tt_megabytes) if tt_megabytes else None
+
+
+def analyze_position(moves, depth, time_budget=None):
+    # Result for one line of columns played from the empty board, X first:
+    # the best move, its value for X, the depth reached and the nodes
+    # searched, or the error that stopped the line being played. Runs in a
+    # process set up by init_worker.
+    if depth < 1:
+        return {'moves': moves, 'error': f'depth {depth} is below 1'}
+
+    game = BitboardConnectFour()
+    for i, move in enumerate(moves):
+        if game.game_over():
+            return {'moves': moves, 'error': f'move {i + 1} is played after the game ended'}
+        symbol = 'X' if game.ply % 2 == 0 else 'O'
+        if move not in COLUMN_NAMES or not game.select_space(int(move), symbol):
+            return {'moves': moves, 'error': f'move {i + 1} ({move!r}) is not a playable column'}
+
+    if game.game_over():
+        return {'moves': moves, 'winner': game.winner or ''}
+
+    # Every position starts from empty tables so results do not depend on
+    # which worker got which lines
+    if _tt is not None:
+        _tt.clear()
+    game.tt = _tt
+    game.stats = SearchStats()
+    game.stats.start(game)
+
+    is_maximizing = game.ply % 2 == 0
+    if time_budget:
+        value, move = iterative_deepening(game, is_maximizing, time_budget, depth)
+    else:
+        value, move = game.minimax(is_maximizing, depth, -float('inf'), float('inf'))
+        game.stats.depth = depth
+
+    return {
+        'moves': moves,
+        'move': move,
+        'value': json_number(value),
+        'depth': game.stats.depth,
+        'nodes': sum(game.stats.nodes),
+    }
+
+
+def _analyze_chunk(lines):
+    return [analyze_position(line, *_settings) for line in lines]
+
+
+def analyze_lines(lines, depth, time_budget=None, workers=None, tt_megabytes=4, chunksize=16):
+    # Yields analyze_position for every line in input order. At most a few
+    # chunks per worker are read ahead, so memory stays bounded however long
+    # the input is.
+    # An empty line is the empty board
+    lines = (line.strip() for line in lines)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(depth, time_budget, tt_megabytes)) as executor:
+        pending = deque()
+        limit = 4 * workers
+        while True:
+            while len(pending) < limit:
+                chunk = list(islice(lines, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_analyze_chunk, chunk))
+
+            if not pending:
+                break
+            yield from pending.popleft().result()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analyze positions given as lines of columns (0-6) played from the empty '
+                                                 'board, writing one JSON result per line in input order')
+    parser.add_argument('input', nargs='?', default='-', help='file of positions, - for standard input')
+    parser.add_argument('--output', default='-', help='file for the results, - for standard output')
+    parser.add_argument('--depth', type=int, default=6, help='search depth, or deepest depth with --time')
+    parser.add_argument('--time', type=float, default=None, help='seconds per position for iterative deepening')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, one per CPU by default')
+    parser.add_argument('--tt-megabytes', type=int, default=4, help='transposition table per worker, 0 disables it')
+    parser.add_argument('--chunksize', type=int, default=16, help='positions sent to a worker at a time')
+    args = parser.parse_args()
+
+    input_file = sys.stdin if args.input == '-' else open(args.input)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        for result in analyze_lines(input_file, args.depth, args.time, args.workers, args.tt_megabytes, args.chunksize):
+            output.write(json.dumps(result) + '\n')
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output is not sys.stdout:
+            output.close()
@@ -0,0 +1,27 @@
+import threading
+
+
+class BackgroundTask:
+    # Runs func(*args) on a daemon thread so a render loop can keep polling
+    # done() instead of blocking, and never holds up the program from exiting
+    def __init__(self, func, *args):
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(func, args), daemon=True)
+        self._thread.start()
+
+    def _run(self, func, args):
+        try:
+            self._result = func(*args)
+        except Exception as error:
+            self._error = error
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def result(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+        return self._result
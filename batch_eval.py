@@ -0,0 +1,96 @@
+import numpy as np
+
+from bitboard import COLUMN_HEIGHT, ROWS, WINDOWS
+
+EMPTY = 0
+X = 1
+O = -1
+
+
+def _bit_to_cell(bit):
+    # Bitboard bit index to an index into a flattened 6x7 board
+    col, height = divmod(bit, COLUMN_HEIGHT)
+    return (ROWS - 1 - height) * 7 + col
+
+
+def _bits(mask):
+    return [bit for bit in range(mask.bit_length()) if mask >> bit & 1]
+
+
+# Flat cell indexes of the four cells and of the two ends of every line
+WINDOW_CELLS = np.array([[_bit_to_cell(bit) for bit in _bits(mask)] for mask, _ in WINDOWS])
+WINDOW_ENDS = np.array([[_bit_to_cell(bit) for bit in _bits(ends)] for _, ends in WINDOWS])
+
+
+def to_array(boards):
+    # Accepts an (N, 6, 7) array of ' '/'X'/'O' strings or of 0/1/-1, or a
+    # sequence of ConnectFour games, and returns the 0/1/-1 int8 form
+    if not isinstance(boards, np.ndarray):
+        boards = np.array([game.board for game in boards])
+
+    if boards.dtype.kind == 'U':
+        return (boards == 'X').astype(np.int8) - (boards == 'O')
+
+    return boards.astype(np.int8, copy=False)
+
+
+def _lines(boards):
+    flat = to_array(boards).reshape(len(boards), -1)
+    cells = flat[:, WINDOW_CELLS]
+    ends = flat[:, WINDOW_ENDS]
+
+    x_count = (cells == X).sum(axis=2)
+    o_count = (cells == O).sum(axis=2)
+    x_ends = (ends == X).sum(axis=2)
+    o_ends = (ends == O).sum(axis=2)
+    return x_count, o_count, x_ends, o_ends
+
+
+def win_flags(boards):
+    x_count, o_count, _, _ = _lines(boards)
+    return (x_count == 4).any(axis=1), (o_count == 4).any(axis=1)
+
+
+def count_streaks(boards):
+    # Same scores as ConnectFour.count_streaks for boards reached by play:
+    # every line without an opponent disc scores its own discs once for
+    # each end the player occupies
+    x_count, o_count, x_ends, o_ends = _lines(boards)
+    x_streaks = np.where(o_count == 0, x_count * x_ends, 0).sum(axis=1)
+    o_streaks = np.where(x_count == 0, o_count * o_ends, 0).sum(axis=1)
+    return x_streaks, o_streaks
+
+
+def evaluate_boards(boards):
+    # Vectorized ConnectFour.evaluate_board: inf where X has four in a row,
+    # -inf where O has, otherwise X's streaks minus O's
+    x_count, o_count, x_ends, o_ends = _lines(boards)
+    x_streaks = np.where(o_count == 0, x_count * x_ends, 0).sum(axis=1)
+    o_streaks = np.where(x_count == 0, o_count * o_ends, 0).sum(axis=1)
+
+    values = (x_streaks - o_streaks).astype(np.float64)
+    values[(o_count == 4).any(axis=1)] = -np.inf
+    values[(x_count == 4).any(axis=1)] = np.inf
+    return values
+
+
+def evaluate_moves(game, symbol):
+    # Scores every position one move from game in a single batch, for
+    # analysing the last ply of a search. Returns [[value, column], ...]
+    board = to_array([game])[0]
+    columns = []
+    children = []
+    for col in range(board.shape[1]):
+        empty_rows = np.flatnonzero(board[:, col] == EMPTY)
+        if len(empty_rows) == 0:
+            continue
+        child = board.copy()
+        child[empty_rows[-1], col] = X if symbol == 'X' else O
+        columns.append(col)
+        children.append(child)
+
+    if not children:
+        return []
+
+    values = evaluate_boards(np.array(children))
+    return [[value, col] for value, col in zip(values.tolist(), columns)]
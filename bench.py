@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import engine
+from solver import CELLS, Solver
+from stats import json_number
+from transposition import TranspositionTable
+
+# Reference positions as the columns played from the empty board, X first.
+# Endgames are also searched until the result is proven.
+POSITIONS = [
+    {'name': 'empty', 'phase': 'opening', 'moves': ''},
+    {'name': 'centre', 'phase': 'opening', 'moves': '3'},
+    {'name': 'middle-10', 'phase': 'middle', 'moves': '6554063531'},
+    {'name': 'middle-20', 'phase': 'middle', 'moves': '02361332310300212662'},
+    {'name': 'endgame-24', 'phase': 'endgame', 'moves': '404105132432331562322411'},
+    {'name': 'endgame-28', 'phase': 'endgame', 'moves': '4041051324323315623224114340'},
+]
+
+# The engine flavours the scripts play with: ConnectFour.py and game.py use
+# the streak evaluator, CompvsComp.py the random one
+ENGINES = {
+    'engine-list': engine.ConnectFour,
+    'engine-bitboard': engine.BitboardConnectFour,
+    'compvscomp-list': engine.RandomEvalConnectFour,
+    'compvscomp-bitboard': engine.BitboardRandomEvalConnectFour,
+}
+
+
+def counting(engine_class):
+    # engine_class with every minimax call counted in game.nodes
+    class CountingEngine(engine_class):
+        def minimax(self, is_maximizing, depth, alpha, beta):
+            self.nodes += 1
+            return super().minimax(is_maximizing, depth, alpha, beta)
+
+    return CountingEngine
+
+
+def setup_position(engine_class, moves, tt_megabytes):
+    # A fresh game with moves played and its own search tables, so earlier
+    # runs leave nothing behind
+    game = counting(engine_class)()
+    for move in moves:
+        game.select_space(int(move), 'X' if game.ply % 2 == 0 else 'O')
+
+    game.nodes = 0
+    game.tt = TranspositionTable(tt_megabytes) if tt_megabytes else None
+    game.endgame = None
+    return game
+
+
+def run_depths(game, max_depth, solve_limit=None):
+    # Iterative deepening by hand. Returns one record per depth with the
+    # nodes and seconds of that iteration and the totals so far, and the
+    # solve record once the value is a proven win or loss or the search
+    # reaches the end of the game, None when that takes over solve_limit
+    # seconds or max_depth is searched first.
+    is_maximizing = game.ply % 2 == 0
+    empty = CELLS - game.ply
+    depths = []
+    solved = None
+    total_seconds = 0
+    for depth in range(1, max(max_depth, empty if solve_limit else 0) + 1):
+        if depth > max_depth and total_seconds > solve_limit:
+            break
+
+        nodes_before = game.nodes
+        start = time.perf_counter()
+        value, move = game.minimax(is_maximizing, depth, -float('inf'), float('inf'))
+        seconds = time.perf_counter() - start
+        total_seconds += seconds
+        nodes = game.nodes - nodes_before
+
+        if depth <= max_depth:
+            depths.append({
+                'depth': depth,
+                'value': json_number(value),
+                'move': move,
+                'nodes': nodes,
+                'seconds': seconds,
+                'nodes_per_second': nodes / seconds if seconds else None,
+                'total_nodes': game.nodes,
+                'time_to_depth': total_seconds,
+            })
+
+        if abs(value) == float('inf') or depth >= empty:
+            if solve_limit:
+                solved = {'depth': depth, 'value': json_number(value), 'move': move,
+                          'nodes': game.nodes, 'time_to_solve': total_seconds}
+            break
+
+    return depths, solved
+
+
+def bench_engine(name, engine_class, max_depth, solve_limit, tt_megabytes, seed):
+    for position in POSITIONS:
+        # random_eval engines search a different tree every run otherwise
+        random.seed(seed)
+        game = setup_position(engine_class, position['moves'], tt_megabytes)
+        limit = solve_limit if position['phase'] == 'endgame' else None
+        depths, solved = run_depths(game, max_depth, limit)
+        yield {
+            'engine': name,
+            'position': position['name'],
+            'phase': position['phase'],
+            'depths': depths,
+            'solve': solved,
+        }
+
+
+def bench_solver(tt_megabytes):
+    # The exact solver on the endgame positions, for comparison
+    for position in POSITIONS:
+        if position['phase'] != 'endgame':
+            continue
+
+        game = engine.BitboardConnectFour()
+        for move in position['moves']:
+            game.select_space(int(move), 'X' if game.ply % 2 == 0 else 'O')
+
+        solver = Solver(tt_megabytes)
+        start = time.perf_counter()
+        score = solver.score(game)
+        seconds = time.perf_counter() - start
+        yield {
+            'engine': 'solver',
+            'position': position['name'],
+            'phase': position['phase'],
+            'depths': [],
+            'solve': {'score': score, 'nodes': solver.nodes, 'time_to_solve': seconds,
+                      'nodes_per_second': solver.nodes / seconds if seconds else None},
+        }
+
+
+def git_commit():
+    # Commit of the checkout bench.py is in, wherever it is run from
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the engines on the reference positions, one JSON object per line')
+    parser.add_argument('--engines', nargs='+', choices=[*ENGINES, 'solver'], default=[*ENGINES, 'solver'])
+    parser.add_argument('--depth', type=int, default=7, help='deepest fixed-depth search of every position')
+    parser.add_argument('--solve-limit', type=float, default=10.0,
+                        help='seconds of searching after which an endgame is no longer searched deeper to solve it')
+    parser.add_argument('--tt-megabytes', type=int, default=16, help='transposition table size, 0 searches without one')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the random_eval engines')
+    parser.add_argument('--output', default='-', help='file for the results, - for standard output')
+    args = parser.parse_args()
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    header = {'commit': git_commit(), 'python': platform.python_version(), 'depth': args.depth,
+              'solve_limit': args.solve_limit, 'tt_megabytes': args.tt_megabytes, 'seed': args.seed}
+    print(json.dumps(header), file=output, flush=True)
+
+    for name in args.engines:
+        if name == 'solver':
+            records = bench_solver(max(args.tt_megabytes, 1))
+        else:
+            records = bench_engine(name, ENGINES[name], args.depth, args.solve_limit, args.tt_megabytes, args.seed)
+        for record in records:
+            print(json.dumps(record), file=output, flush=True)
+
+    if output is not sys.stdout:
+        output.close()
@@ -0,0 +1,313 @@
+import random
+
+# Bitboard layout: every column takes 7 bits (6 playable rows plus a sentinel
+# bit on top so shifted lines never wrap into the next column). Bit index is
+# column * 7 + height, where height 0 is the bottom row of the board.
+#
+#  6 13 20 27 34 41 48
+#  5 12 19 26 33 40 47
+#  4 11 18 25 32 39 46
+#  3 10 17 24 31 38 45
+#  2  9 16 23 30 37 44
+#  1  8 15 22 29 36 43
+#  0  7 14 21 28 35 42
+
+ROWS = 6
+COLUMNS = 7
+COLUMN_HEIGHT = ROWS + 1
+# Columns as they are written in move lists and protocol commands
+COLUMN_NAMES = [str(col) for col in range(COLUMNS)]
+
+# Shift between neighbouring cells: vertical, horizontal, / and \ diagonals
+DIRECTIONS = (1, COLUMN_HEIGHT, COLUMN_HEIGHT + 1, COLUMN_HEIGHT - 1)
+
+BOARD_MASK = 0
+BOTTOM_MASK = 0
+for _col in range(COLUMNS):
+    BOARD_MASK |= ((1 << ROWS) - 1) << (_col * COLUMN_HEIGHT)
+    BOTTOM_MASK |= 1 << (_col * COLUMN_HEIGHT)
+
+
+def cell_bit(row, col):
+    # row counts from the top like ConnectFour.board, the bitboard from the bottom
+    return col * COLUMN_HEIGHT + (ROWS - 1 - row)
+
+
+def position_key(x_mask, o_mask):
+    # Unique 49-bit key: X's discs plus a marker bit just above the top disc
+    # of every column
+    return x_mask | ((x_mask | o_mask) + BOTTOM_MASK)
+
+
+def board_masks(board):
+    # X and O bitboards of a ConnectFour.board list of lists
+    masks = {'X': 0, 'O': 0, ' ': 0}
+    for row in range(ROWS):
+        for col in range(COLUMNS):
+            masks[board[row][col]] |= 1 << cell_bit(row, col)
+
+    return masks['X'], masks['O']
+
+
+def board_key(board):
+    # position_key of a ConnectFour.board list of lists
+    return position_key(*board_masks(board))
+
+
+# Mask of the first column, sentinel bit included, and the column pairs
+# swapped by a left-right reflection as (mask of the left one, shift to the
+# right one)
+_COLUMN_MASK = (1 << COLUMN_HEIGHT) - 1
+_MIRROR_PAIRS = [(_COLUMN_MASK << col * COLUMN_HEIGHT, (COLUMNS - 1 - 2 * col) * COLUMN_HEIGHT)
+                 for col in range(COLUMNS // 2)]
+_MIDDLE_COLUMN = _COLUMN_MASK << COLUMNS // 2 * COLUMN_HEIGHT
+
+
+def won(mask):
+    # Whether the discs in mask hold a line of four
+    for shift in DIRECTIONS:
+        pairs = mask & (mask >> shift)
+        if pairs & (pairs >> 2 * shift):
+            return True
+
+    return False
+
+
+def mirror_mask(mask):
+    # mask reflected left to right, column c moving to column 6 - c
+    mirrored = mask & _MIDDLE_COLUMN
+    for left, shift in _MIRROR_PAIRS:
+        mirrored |= (mask & left) << shift | (mask >> shift) & left
+    return mirrored
+
+
+def canonical_key(x_mask, o_mask):
+    # [key, mirrored]: the smaller of the position_key of the position and of
+    # its mirror image, so both share one key, and whether it is the mirror's.
+    # Moves stored under a mirrored key are mirrored as well.
+    key = position_key(x_mask, o_mask)
+    mirror_key = mirror_mask(key)
+    if mirror_key < key:
+        return [mirror_key, True]
+
+    return [key, False]
+
+
+def _build_windows():
+    # Every line of four cells as (mask, mask of its two end cells)
+    windows = []
+    for row in range(ROWS):
+        for col in range(COLUMNS):
+            for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row = row + 3 * d_row
+                end_col = col + 3 * d_col
+                if not (0 <= end_row < ROWS and 0 <= end_col < COLUMNS):
+                    continue
+                mask = 0
+                for i in range(4):
+                    mask |= 1 << cell_bit(row + i * d_row, col + i * d_col)
+                windows.append((mask, 1 << cell_bit(row, col) | 1 << cell_bit(end_row, end_col)))
+    return windows
+
+
+WINDOWS = _build_windows()
+
+# Indexes into WINDOWS of the lines passing through each bit
+CELL_WINDOWS = [[index for index, (mask, _) in enumerate(WINDOWS) if mask >> bit & 1]
+                for bit in range(COLUMNS * COLUMN_HEIGHT)]
+
+# Bit index of the same cell in the mirror-image column
+MIRROR_BIT = [(COLUMNS - 1 - bit // COLUMN_HEIGHT) * COLUMN_HEIGHT + bit % COLUMN_HEIGHT
+              for bit in range(COLUMNS * COLUMN_HEIGHT)]
+
+# Zobrist keys per symbol for every bit index, from a fixed seed so hashes
+# are the same in every process
+_random = random.Random(0xC4)
+ZOBRIST = {symbol: [_random.getrandbits(64) for _ in range(COLUMNS * COLUMN_HEIGHT)] for symbol in 'XO'}
+
+
+class Bitboard:
+    rows = ROWS
+    columns = COLUMNS
+
+    def __init__(self):
+        self.masks = {'X': 0, 'O': 0}
+        self.heights = [0] * self.columns
+        self.hash = 0
+        # hash of the mirror-image position
+        self.mirror_hash = 0
+        self.ply = 0
+        # Set by the move that completed a line of four
+        self.winner = None
+        # count_streaks totals, kept up to date from the per-line scores
+        self.streaks = {'X': 0, 'O': 0}
+        self.line_streaks = {'X': [0] * len(WINDOWS), 'O': [0] * len(WINDOWS)}
+
+    @property
+    def board(self):
+        # List-of-lists view matching ConnectFour.board, for display and callers
+        # that still index cells directly
+        board = [[' '] * self.columns for _ in range(self.rows)]
+        for symbol, mask in self.masks.items():
+            for row in range(self.rows):
+                for col in range(self.columns):
+                    if mask >> cell_bit(row, col) & 1:
+                        board[row][col] = symbol
+
+        return board
+
+    def check_win(self, symbol):
+        return won(self.masks[symbol])
+
+    def select_space(self, column, symbol):
+        height = self.heights[column]
+        if height == self.rows:
+            return False
+
+        bit = column * COLUMN_HEIGHT + height
+        self.masks[symbol] |= 1 << bit
+        self._update_streaks(bit)
+        self.heights[column] = height + 1
+        self.hash ^= ZOBRIST[symbol][bit]
+        self.mirror_hash ^= ZOBRIST[symbol][MIRROR_BIT[bit]]
+        self.ply += 1
+        # Only the player who just moved can have completed a line
+        if self.check_win(symbol):
+            self.winner = symbol
+        return True
+
+    def key(self):
+        return position_key(self.masks['X'], self.masks['O'])
+
+    def canonical_key(self):
+        return canonical_key(self.masks['X'], self.masks['O'])
+
+    def undo_move(self, column):
+        height = self.heights[column] - 1
+        bit = column * COLUMN_HEIGHT + height
+        symbol = 'X' if self.masks['X'] >> bit & 1 else 'O'
+        self.masks[symbol] &= ~(1 << bit)
+        self._update_streaks(bit)
+        self.heights[column] = height
+        self.hash ^= ZOBRIST[symbol][bit]
+        self.mirror_hash ^= ZOBRIST[symbol][MIRROR_BIT[bit]]
+        self.ply -= 1
+        # No move is ever played on a won position
+        self.winner = None
+
+    def available_moves(self):
+        return [col for col in range(self.columns) if self.heights[col] < self.rows]
+
+    def get_free_row_num(self, column):
+        if self.heights[column] == self.rows:
+            return -1
+
+        return self.rows - 1 - self.heights[column]
+
+    def board_full(self):
+        return self.ply == self.rows * self.columns
+
+    def print_board(self):
+        for row in self.board:
+            print(" | ".join(row))
+        print("--------------------------")
+        print()
+
+    def game_over(self):
+        return self.winner is not None or self.board_full()
+
+    def _update_streaks(self, bit):
+        # Rescores the lines through a cell that has just changed
+        x = self.masks['X']
+        o = self.masks['O']
+        x_lines = self.line_streaks['X']
+        o_lines = self.line_streaks['O']
+        x_delta = 0
+        o_delta = 0
+
+        for index in CELL_WINDOWS[bit]:
+            mask, ends = WINDOWS[index]
+            x_score = 0 if mask & o else (mask & x).bit_count() * (ends & x).bit_count()
+            o_score = 0 if mask & x else (mask & o).bit_count() * (ends & o).bit_count()
+            x_delta += x_score - x_lines[index]
+            o_delta += o_score - o_lines[index]
+            x_lines[index] = x_score
+            o_lines[index] = o_score
+
+        self.streaks['X'] += x_delta
+        self.streaks['O'] += o_delta
+
+    def count_streaks(self, symbol):
+        return self.streaks[symbol]
+
+    def scan_streaks(self, symbol):
+        # Same score as the list-based ConnectFour.count_streaks: every line of
+        # four without an opponent disc scores its number of own discs once
+        # for each end of the line the player occupies
+        own = self.masks[symbol]
+        opponent = self.masks['O' if symbol == 'X' else 'X']
+        count = 0
+
+        for mask, ends in WINDOWS:
+            if not mask & opponent:
+                count += (mask & own).bit_count() * (ends & own).bit_count()
+
+        return count
+
+
+def check_streaks(games=1000, seed=0):
+    # Plays and unwinds random games, checking the incrementally kept
+    # count_streaks against a full rescan after every move
+    rng = random.Random(seed)
+    for _ in range(games):
+        position = Bitboard()
+        symbol = 'X'
+        moves = []
+        while not position.game_over():
+            column = rng.choice(position.available_moves())
+            position.select_space(column, symbol)
+            moves.append(column)
+            symbol = 'O' if symbol == 'X' else 'X'
+            for player in 'XO':
+                assert position.count_streaks(player) == position.scan_streaks(player), (position.board, player)
+
+        while moves:
+            position.undo_move(moves.pop())
+            for player in 'XO':
+                assert position.count_streaks(player) == position.scan_streaks(player), (position.board, player)
+
+
+def check_against_list_engine(games=200, seed=0):
+    # Plays and unwinds random games on a Bitboard and on the list-based
+    # engine.ConnectFour side by side, checking count_streaks agrees for both
+    # players after every move and undo
+    from engine import ConnectFour
+
+    rng = random.Random(seed)
+    for _ in range(games):
+        position = Bitboard()
+        reference = ConnectFour()
+        symbol = 'X'
+        moves = []
+        while not position.game_over():
+            column = rng.choice(position.available_moves())
+            position.select_space(column, symbol)
+            reference.select_space(column, symbol)
+            moves.append(column)
+            symbol = 'O' if symbol == 'X' else 'X'
+            for player in 'XO':
+                assert position.count_streaks(player) == reference.count_streaks(player), (reference.board, player)
+
+        while moves:
+            column = moves.pop()
+            position.undo_move(column)
+            reference.undo_move(column)
+            for player in 'XO':
+                assert position.count_streaks(player) == reference.count_streaks(player), (reference.board, player)
+
+
+if __name__ == '__main__':
+    check_streaks()
+    print('count_streaks matches a full rescan')
+    check_against_list_engine()
+    print('count_streaks matches the list engine')
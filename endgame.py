@@ -0,0 +1,191 @@
+from array import array
+import argparse
+import bisect
+import mmap
+import os
+import random
+import struct
+import time
+
+from bitboard import COLUMN_HEIGHT, COLUMNS, canonical_key
+from engine import BitboardConnectFour
+from solver import CELLS, COLUMN_MASKS, Solver, playable_cells, winning_cells
+
+ENDGAME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endgame.bin')
+
+MAGIC = b'C4EG'
+VERSION = 1
+# magic, version, most empty cells covered, number of positions
+HEADER = struct.Struct('<4sHHI')
+
+# File layout after the header, little-endian: the sorted canonical_keys of
+# the positions as uint64, then the exact solver score of each for the side
+# to move as int8, then its best move as int8. A position and its mirror
+# image share one entry.
+
+
+def _solve_all(current, mask, moves, table):
+    # Exact score of every position below this one, stored in table as
+    # key -> (score, best move); returns this position's score. Keys are the
+    # canonical_key of the X and O discs, as probe looks them up.
+    x_mask = current if moves % 2 == 0 else current ^ mask
+    key, mirrored = canonical_key(x_mask, x_mask ^ mask)
+    if key in table:
+        return table[key][0]
+
+    playable = playable_cells(mask)
+    wins = winning_cells(current, mask) & playable
+    if wins:
+        best_score = (CELLS + 1 - moves) // 2
+        best_move = ((wins & -wins).bit_length() - 1) // COLUMN_HEIGHT
+    else:
+        best_score = None
+        for col in range(COLUMNS):
+            move = playable & COLUMN_MASKS[col]
+            if not move:
+                continue
+            if moves + 1 == CELLS:
+                score = 0
+            else:
+                score = -_solve_all(current ^ mask, mask | move, moves + 1, table)
+            if best_score is None or score > best_score:
+                best_score = score
+                best_move = col
+
+    table[key] = (best_score, COLUMNS - 1 - best_move if mirrored else best_move)
+    return best_score
+
+
+def seed_positions(games, depth, random_plies, seed=0):
+    # Yields the position before every move of self-play games between
+    # minimax players; the opening moves are random so the games differ.
+    rng = random.Random(seed)
+    for _ in range(games):
+        game = BitboardConnectFour()
+        while not game.game_over():
+            yield game
+            is_maximizing = game.ply % 2 == 0
+            if game.ply < random_plies:
+                move = rng.choice(game.available_moves())
+            else:
+                move = game.minimax(is_maximizing, depth, -float('inf'), float('inf'))[1]
+            game.select_space(move, 'X' if is_maximizing else 'O')
+
+
+def generate(path, max_empty, games, depth=2, random_plies=8, seed=0):
+    # Solves every position reachable from the self-play games once they have
+    # at most max_empty empty cells and writes the database. Every reachable
+    # position from the empty board is far beyond one machine, so the games
+    # choose which endgames get covered. Returns the number of positions.
+    table = {}
+    for game in seed_positions(games, depth, random_plies, seed):
+        if CELLS - game.ply <= max_empty:
+            x, o = game.masks['X'], game.masks['O']
+            current = x if game.ply % 2 == 0 else o
+            _solve_all(current, x | o, game.ply, table)
+
+    keys = sorted(table)
+    with open(path, 'wb') as database_file:
+        database_file.write(HEADER.pack(MAGIC, VERSION, max_empty, len(keys)))
+        array('Q', keys).tofile(database_file)
+        array('b', [table[key][0] for key in keys]).tofile(database_file)
+        array('b', [table[key][1] for key in keys]).tofile(database_file)
+
+    return len(keys)
+
+
+def check(path, games, depth=2, random_plies=8, seed=0):
+    # Probes every covered position of the seed games generate was given,
+    # with either side to move, and checks it is found with the score
+    # solver.Solver gives it. Returns the positions checked with X and with O
+    # to move.
+    database = EndgameDatabase(path)
+    solver = Solver(16)
+    checked = [0, 0]
+    try:
+        for game in seed_positions(games, depth, random_plies, seed):
+            if game.ply < database.min_ply:
+                continue
+            entry = database.probe(game)
+            if entry is None:
+                raise AssertionError(f'position after {game.ply} moves is missing from {path}')
+            score = solver.score(game)
+            if entry[0] != score:
+                raise AssertionError(f'position after {game.ply} moves scores {entry[0]}, the solver says {score}')
+            checked[game.ply % 2] += 1
+    finally:
+        database.close()
+
+    return checked
+
+
+class EndgameDatabase:
+    def __init__(self, path=ENDGAME_PATH):
+        with open(path, 'rb') as database_file:
+            self._map = mmap.mmap(database_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.max_empty, self.size = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f'{path} is not a version {VERSION} endgame database')
+        self.min_ply = CELLS - self.max_empty
+
+        view = memoryview(self._map)
+        offset = HEADER.size
+        self._keys = view[offset:offset + 8 * self.size].cast('Q')
+        offset += 8 * self.size
+        self._scores = view[offset:offset + self.size].cast('b')
+        offset += self.size
+        self._moves = view[offset:offset + self.size].cast('b')
+
+    def probe(self, game):
+        # [solver score for the side to move, best move], or None when the
+        # position is not in the database
+        if game.ply < self.min_ply:
+            return None
+
+        key, mirrored = game.canonical_key()
+        index = bisect.bisect_left(self._keys, key)
+        if index < self.size and self._keys[index] == key:
+            move = self._moves[index]
+            return [self._scores[index], game.columns - 1 - move if mirrored else move]
+
+        return None
+
+    def value(self, game):
+        # probe as a minimax [value, move]: inf when X wins, -inf when O
+        # wins and 0 for a draw
+        entry = self.probe(game)
+        if entry is None:
+            return None
+
+        score, move = entry
+        if score == 0:
+            return [0, move]
+        x_wins = (score > 0) == (game.ply % 2 == 0)
+        return [float('inf') if x_wins else -float('inf'), move]
+
+    def close(self):
+        for view in (self._keys, self._scores, self._moves):
+            view.release()
+        self._map.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the endgame database used by minimax')
+    parser.add_argument('--max-empty', type=int, default=14, help='cover positions with at most this many empty cells')
+    parser.add_argument('--games', type=int, default=200, help='self-play games whose endgames are covered')
+    parser.add_argument('--depth', type=int, default=2, help='minimax depth of the self-play games')
+    parser.add_argument('--random-plies', type=int, default=8, help='random opening moves of each game')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=ENDGAME_PATH)
+    parser.add_argument('--check', action='store_true', help='probe every covered seed position against the solver')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = generate(args.output, args.max_empty, args.games, args.depth, args.random_plies, args.seed)
+    print(f'{count} positions, {os.path.getsize(args.output)} bytes, '
+          f'{time.perf_counter() - start:.1f}s -> {args.output}')
+    if args.check:
+        x_checked, o_checked = check(args.output, args.games, args.depth, args.random_plies, args.seed)
+        print(f'{x_checked} positions with X to move and {o_checked} with O to move match the solver')
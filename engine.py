@@ -0,0 +1,353 @@
+import random
+import time
+
+from bitboard import Bitboard, ZOBRIST, board_masks, canonical_key, cell_bit
+from ordering import MoveOrderer
+from search import SearchTimeout
+from transposition import SIDE_KEY
+
+
+class ConnectFour:
+    rows = 6
+    columns = 7
+    tt = None
+    deadline = None
+    endgame = None
+    stats = None
+
+    def __init__(self):
+        self.board = [[' '] * self.columns for _ in range(self.rows)]
+        self.hash = 0
+        # hash of the mirror-image position
+        self.mirror_hash = 0
+        self.ply = 0
+        # Set by the move that completed a line of four
+        self.winner = None
+        # Killer and history tables of this game's searches
+        self.orderer = MoveOrderer()
+
+    def check_win(self, symbol):
+        # Horizontally
+        for row in range(len(self.board)):
+            for col in range(len(self.board[0]) - 3):
+                if all(self.board[row][col + i] == symbol for i in range(4)):
+                    return True
+
+        # Vertically
+        for row in range(len(self.board) - 3):
+            for col in range(len(self.board[0])):
+                if all(self.board[row + i][col] == symbol for i in range(4)):
+                    return True
+
+        # Diagonally in \ direction
+        for row in range(len(self.board) - 3):
+            for col in range(len(self.board[0]) - 3):
+                if all(self.board[row + i][col + i] == symbol for i in range(4)):
+                    return True
+
+        # Diagonally in / direction
+        for row in range(len(self.board) - 3):
+            for col in range(3, len(self.board[0])):
+                if all(self.board[row + i][col - i] == symbol for i in range(4)):
+                    return True
+
+        return False
+
+    def check_win_at(self, row, column):
+        # Whether the disc at (row, column) is part of a line of four
+        symbol = self.board[row][column]
+        for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            for sign in (1, -1):
+                r = row + sign * d_row
+                c = column + sign * d_col
+                while 0 <= r < self.rows and 0 <= c < self.columns and self.board[r][c] == symbol:
+                    count += 1
+                    r += sign * d_row
+                    c += sign * d_col
+            if count >= 4:
+                return True
+
+        return False
+
+    def select_space(self, column, symbol):
+        for row in range(len(self.board) - 1, -1, -1):
+            if self.board[row][column] == ' ':
+                self.board[row][column] = symbol
+                self.hash ^= ZOBRIST[symbol][cell_bit(row, column)]
+                self.mirror_hash ^= ZOBRIST[symbol][cell_bit(row, self.columns - 1 - column)]
+                self.ply += 1
+                if self.check_win_at(row, column):
+                    self.winner = symbol
+                return True
+
+        return False
+
+    def undo_move(self, column):
+        for row in range(len(self.board)):
+            if self.board[row][column] != ' ':
+                self.hash ^= ZOBRIST[self.board[row][column]][cell_bit(row, column)]
+                self.mirror_hash ^= ZOBRIST[self.board[row][column]][cell_bit(row, self.columns - 1 - column)]
+                self.board[row][column] = ' '
+                self.ply -= 1
+                # No move is ever played on a won position
+                self.winner = None
+                break
+
+    def available_moves(self):
+        available_moves = []
+        for col in range(len(self.board[0])):
+            if self.board[0][col] == ' ':
+                available_moves.append(col)
+
+        return available_moves
+
+    def get_free_row_num(self, column):
+        if self.board[0][column] != ' ':
+            return -1
+
+        for row in range(len(self.board) - 1, -1, -1):
+            if self.board[row][column] == ' ':
+                return row
+
+    def board_full(self):
+        return self.ply == self.rows * self.columns
+
+    def print_board(self):
+        for row in self.board:
+            print(" | ".join(row))
+        print("--------------------------")
+        print()
+
+    def game_over(self):
+        return self.winner is not None or self.board_full()
+
+    def canonical_key(self):
+        return canonical_key(*board_masks(self.board))
+
+    def tt_key(self, is_maximizing):
+        # [key, mirrored]: the transposition table key of the position, shared
+        # with its mirror image, and whether moves stored under it are mirrored
+        mirrored = self.mirror_hash < self.hash
+        key = self.mirror_hash if mirrored else self.hash
+        return [key ^ SIDE_KEY if is_maximizing else key, mirrored]
+
+    def unique_moves(self, moves):
+        # A position that is its own mirror image only needs the moves in the
+        # left half and the middle column searched
+        if self.hash == self.mirror_hash:
+            return [col for col in moves if col <= self.columns // 2]
+
+        return moves
+
+    def random_eval(self):
+        return random.randint(-100, 100)
+
+    def count_streaks(self, symbol):
+        count = 0
+
+        for row in range(len(self.board)):
+            for col in range(len(self.board[0])):
+                if self.board[row][col] != symbol:
+                    continue
+
+                # Right Streaks
+                if col < len(self.board[0]) - 3:
+                    num_in_streak = 0
+                    for i in range(4):
+                        if self.board[row][col + i] == symbol:
+                            num_in_streak += 1
+                        elif self.board[row][col + i] != ' ':
+                            num_in_streak = 0
+                            break
+                    count += num_in_streak
+
+                # Left Streaks
+                if col > 2:
+                    num_in_streak = 0
+                    for i in range(4):
+                        if self.board[row][col - i] == symbol:
+                            num_in_streak += 1
+                        elif self.board[row][col - i] != ' ':
+                            num_in_streak = 0
+                            break
+                    count += num_in_streak
+
+                # Down-Right Streaks
+                if col < len(self.board[0]) - 3 and row < len(self.board) - 3:
+                    num_in_streak = 0
+                    for i in range(4):
+                        if self.board[row + i][col + i] == symbol:
+                            num_in_streak += 1
+                        elif self.board[row + i][col + i] != ' ':
+                            num_in_streak = 0
+                            break
+                    count += num_in_streak
+
+                # Up-Right Streaks
+                if col < len(self.board[0]) - 3 and row > 2:
+                    num_in_streak = 0
+                    for i in range(4):
+                        if self.board[row - i][col + i] == symbol:
+                            num_in_streak += 1
+                        elif self.board[row - i][col + i] != ' ':
+                            num_in_streak = 0
+                            break
+                    count += num_in_streak
+
+                # Up-Left Streaks
+                if col > 2 and row > 2:
+                    num_in_streak = 0
+                    for i in range(4):
+                        if self.board[row - i][col - i] == symbol:
+                            num_in_streak += 1
+                        elif self.board[row - i][col - i] != ' ':
+                            num_in_streak = 0
+                            break
+                    count += num_in_streak
+
+                # Down-Left Streaks
+                if col > 2 and row < len(self.board) - 3:
+                    num_in_streak = 0
+                    for i in range(4):
+                        if self.board[row + i][col - i] == symbol:
+                            num_in_streak += 1
+                        elif self.board[row + i][col - i] != ' ':
+                            num_in_streak = 0
+                            break
+                    count += num_in_streak
+
+                # Up Streaks
+                if row > 2:
+                    num_in_streak = 0
+                    for i in range(4):
+                        if self.board[row - i][col] == symbol:
+                            num_in_streak += 1
+                        elif self.board[row - i][col] == ' ':
+                            break
+                        else:
+                            num_in_streak = 0
+                            break
+                    count += num_in_streak
+
+                # Down Streaks
+                if row < len(self.board) - 3:
+                    num_in_streak = 0
+                    for i in range(4):
+                        if self.board[row + i][col] == symbol:
+                            num_in_streak += 1
+                        else:
+                            num_in_streak = 0
+                            break
+                    count += num_in_streak
+
+        return count
+
+    def evaluate_board(self):
+        if self.winner == 'X':
+            return float('inf')
+
+        elif self.winner == 'O':
+            return -float('inf')
+
+        else:
+            # return self.random_eval()
+            x_streaks = self.count_streaks('X')
+            o_streaks = self.count_streaks('O')
+
+            return x_streaks - o_streaks
+
+    def minimax(self, is_maximizing, depth, alpha, beta):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        if self.stats is not None:
+            self.stats.visit(self.ply)
+
+        if self.game_over() or depth == 0:
+            if self.stats is not None:
+                self.stats.leaf_evals += 1
+            return [self.evaluate_board(), '']
+
+        if self.endgame is not None:
+            entry = self.endgame.value(self)
+            if entry is not None:
+                return entry
+
+        tt_move = ''
+        if self.tt is not None:
+            # tt_key, inlined as it runs at every node
+            mirrored = self.mirror_hash < self.hash
+            key = self.mirror_hash if mirrored else self.hash
+            if is_maximizing:
+                key ^= SIDE_KEY
+            tt_value, tt_move = self.tt.probe(key, depth, alpha, beta)
+            if mirrored and tt_move != '':
+                tt_move = self.columns - 1 - tt_move
+            if self.stats is not None:
+                self.stats.tt_probes += 1
+                self.stats.tt_hits += tt_value is not None
+            if tt_value is not None:
+                return [tt_value, tt_move]
+            alpha_orig, beta_orig = alpha, beta
+
+        if is_maximizing:
+            best_value = -float('inf')
+            symbol = 'X'
+        else:
+            best_value = float('inf')
+            symbol = 'O'
+
+        available_moves = self.orderer.order(self.unique_moves(self.available_moves()), self.ply, symbol, tt_move)
+        best_move = available_moves[0]
+
+        for searched, col in enumerate(available_moves):
+            self.select_space(col, symbol)
+            try:
+                value = self.minimax(not is_maximizing, depth - 1, alpha, beta)[0]
+            finally:
+                self.undo_move(col)
+            if is_maximizing:
+                if value > best_value:
+                    best_value = value
+                    best_move = col
+                    alpha = max(alpha, best_value)
+            else:
+                if value < best_value:
+                    best_value = value
+                    best_move = col
+                    beta = min(beta, best_value)
+            if alpha >= beta:
+                self.orderer.cutoff(col, self.ply, symbol, depth)
+                if self.stats is not None:
+                    self.stats.cutoffs += 1
+                    self.stats.first_move_cutoffs += searched == 0
+                break
+
+        if self.tt is not None:
+            self.tt.store(key, depth, alpha_orig, beta_orig, best_value,
+                          self.columns - 1 - best_move if mirrored else best_move)
+
+        return [best_value, best_move]
+
+
+class BitboardConnectFour(Bitboard, ConnectFour):
+    def __init__(self):
+        Bitboard.__init__(self)
+        self.orderer = MoveOrderer()
+
+
+class RandomEvalConnectFour(ConnectFour):
+    # CompvsComp's engine: wins are scored and everything else is noise
+    def evaluate_board(self):
+        if self.winner == 'X':
+            return float('inf')
+
+        if self.winner == 'O':
+            return -float('inf')
+
+        return self.random_eval()
+
+
+class BitboardRandomEvalConnectFour(BitboardConnectFour, RandomEvalConnectFour):
+    pass
@@ -0,0 +1,235 @@
+import argparse
+import math
+import random
+import time
+
+from bitboard import BOARD_MASK, COLUMNS, board_masks, mirror_mask, won
+from solver import COLUMN_MASKS, playable_cells, winning_cells
+
+# Positions in here are two ints like the solver's: the discs of the side to
+# move and the mask of every disc. Scores run from 0 to 1, 1 a win and 0.5 a
+# draw, and a node's score is for the player whose move led to it.
+
+
+def _random_bit(cells, rng):
+    # One of cells, which holds at most one cell per column
+    while True:
+        bit = cells & COLUMN_MASKS[rng.randrange(COLUMNS)]
+        if bit:
+            return bit
+
+
+def random_rollout(current, mask, rng):
+    # Plays random moves to the end, scored for the side to move at the start
+    score = 1
+    while True:
+        bit = _random_bit(playable_cells(mask), rng)
+        current |= bit
+        mask |= bit
+        if won(current):
+            return score
+        if mask == BOARD_MASK:
+            return 0.5
+        current ^= mask
+        score = 1 - score
+
+
+def heuristic_rollout(current, mask, rng):
+    # Like random_rollout, but takes an immediate win, blocks the opponent's
+    # and keeps out from under the opponent's winning cells when it can
+    score = 1
+    while True:
+        playable = playable_cells(mask)
+        if winning_cells(current, mask) & playable:
+            return score
+        opponent_wins = winning_cells(current ^ mask, mask)
+        forced = playable & opponent_wins
+        if forced:
+            bit = forced & -forced
+        else:
+            bit = _random_bit(playable & ~(opponent_wins >> 1) or playable, rng)
+        current |= bit
+        mask |= bit
+        if mask == BOARD_MASK:
+            return 0.5
+        current ^= mask
+        score = 1 - score
+
+
+ROLLOUTS = {'heuristic': heuristic_rollout, 'random': random_rollout}
+
+
+class Node:
+    __slots__ = ('move', 'parent', 'children', 'untried', 'visits', 'score', 'terminal')
+
+    def __init__(self, move, parent, current, mask, rng):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        # Columns not expanded yet, in random order. A position that is its
+        # own mirror image only needs the left half and the middle column.
+        self.untried = [col for col in range(COLUMNS) if playable_cells(mask) & COLUMN_MASKS[col]]
+        if mirror_mask(mask) == mask and mirror_mask(current) == current:
+            self.untried = [col for col in self.untried if col <= COLUMNS // 2]
+        rng.shuffle(self.untried)
+        self.visits = 0
+        self.score = 0
+        # Score of a move that ended the game, None while it goes on
+        self.terminal = None
+
+
+class MCTS:
+    # UCT search that can be stopped at any time. The tree is kept between
+    # searches: a search starts from the node of its position when the moves
+    # played since the last search are in the tree, so the playouts already
+    # run below it still count.
+    def __init__(self, exploration=1.4, rollout='heuristic', seed=None):
+        self.exploration = exploration
+        self.rollout = ROLLOUTS[rollout]
+        self.rng = random.Random(seed)
+        self.root = None
+        # [X, O] masks of the root position
+        self.root_masks = None
+        # perf_counter() time the search stops at, 0 stops it from another
+        # thread and None leaves it to the playout budget
+        self.deadline = None
+        # Playouts run by the last search, and how many of its root visits
+        # came from earlier searches
+        self.playouts = 0
+        self.reused = 0
+
+    def clear(self):
+        self.root = None
+        self.root_masks = None
+
+    def _find(self, masks):
+        # Node below the root of the position with [X, O] masks, or None
+        if self.root is None:
+            return None
+        found = list(self.root_masks)
+        if found[0] & ~masks[0] or found[1] & ~masks[1]:
+            return None
+
+        node = self.root
+        side = (found[0] | found[1]).bit_count() % 2
+        while found != masks:
+            taken = found[0] | found[1]
+            for child in node.children:
+                bit = playable_cells(taken) & COLUMN_MASKS[child.move]
+                if bit & masks[side]:
+                    break
+            else:
+                return None
+            found[side] |= bit
+            node = child
+            side = 1 - side
+
+        return node
+
+    def search(self, game, is_maximizing, time_budget=None, playouts=None):
+        # Runs playouts until time_budget seconds have passed, playouts have
+        # been run or deadline is set to 0, and returns [value, move] like
+        # minimax: the most visited move, valued from -1 to 1 for X, or
+        # +-inf when it wins on the spot
+        masks = list(board_masks(game.board))
+        mover = masks[0] if is_maximizing else masks[1]
+        taken = masks[0] | masks[1]
+        rng = self.rng
+
+        root = self._find(masks)
+        if root is None or root.terminal is not None:
+            root = Node(None, None, mover, taken, rng)
+        root.parent = None
+        self.root = root
+        self.root_masks = masks
+        self.reused = root.visits
+
+        if time_budget is not None:
+            self.deadline = time.perf_counter() + time_budget
+        exploration = self.exploration
+        rollout = self.rollout
+
+        self.playouts = 0
+        try:
+            # Always one playout so there is a move to play
+            while not self.playouts or ((playouts is None or self.playouts < playouts) and
+                                        (self.deadline is None or time.perf_counter() < self.deadline)):
+                node = root
+                current = mover
+                mask = taken
+
+                # Walk down the fully expanded part of the tree by UCT
+                while not node.untried and node.terminal is None:
+                    log_visits = math.log(node.visits)
+                    best_uct = -1
+                    for child in node.children:
+                        uct = child.score / child.visits + exploration * math.sqrt(log_visits / child.visits)
+                        if uct > best_uct:
+                            best_uct = uct
+                            node = child
+                    bit = playable_cells(mask) & COLUMN_MASKS[node.move]
+                    mask |= bit
+                    current = (current | bit) ^ mask
+
+                if node.terminal is None:
+                    col = node.untried.pop()
+                    bit = playable_cells(mask) & COLUMN_MASKS[col]
+                    current |= bit
+                    mask |= bit
+                    node = Node(col, node, current, mask, rng)
+                    node.parent.children.append(node)
+                    if won(current):
+                        node.terminal = 1
+                    elif mask == BOARD_MASK:
+                        node.terminal = 0.5
+                    current ^= mask
+
+                if node.terminal is None:
+                    score = 1 - rollout(current, mask, rng)
+                else:
+                    score = node.terminal
+
+                while node is not None:
+                    node.visits += 1
+                    node.score += score
+                    score = 1 - score
+                    node = node.parent
+                self.playouts += 1
+        finally:
+            self.deadline = None
+
+        best = max(root.children, key=lambda child: child.visits)
+        if best.terminal == 1:
+            value = float('inf')
+        else:
+            value = 2 * best.score / best.visits - 1
+
+        return [value if is_maximizing else -value, best.move]
+
+
+if __name__ == '__main__':
+    from engine import BitboardConnectFour
+
+    parser = argparse.ArgumentParser(description='Run a Monte Carlo tree search on a position')
+    parser.add_argument('moves', nargs='?', default='', help='columns (0-6) played from the empty board, X first')
+    parser.add_argument('--time', type=float, default=1.0, help='seconds to search')
+    parser.add_argument('--playouts', type=int, default=None, help='stop after this many playouts')
+    parser.add_argument('--rollout', choices=sorted(ROLLOUTS), default='heuristic')
+    parser.add_argument('--exploration', type=float, default=1.4)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    game = BitboardConnectFour()
+    for move in args.moves:
+        game.select_space(int(move), 'X' if game.ply % 2 == 0 else 'O')
+    game.print_board()
+
+    mcts = MCTS(args.exploration, args.rollout, args.seed)
+    start = time.perf_counter()
+    value, move = mcts.search(game, game.ply % 2 == 0, args.time, args.playouts)
+    elapsed = time.perf_counter() - start
+
+    print(f'move {move}, value {value:+.3f} for X')
+    print(f'{mcts.playouts} playouts in {elapsed:.2f}s, {mcts.playouts / elapsed:.0f}/s')
+    for child in sorted(mcts.root.children, key=lambda child: -child.visits):
+        print(f'  {child.move}: {child.visits} visits, {child.score / child.visits:.3f}')
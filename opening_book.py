@@ -0,0 +1,107 @@
+from array import array
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import time
+
+from engine import BitboardConnectFour
+from transposition import TranspositionTable
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+
+MAGIC = b'C4OB'
+VERSION = 1
+# magic, version, plies covered, search depth, number of positions
+HEADER = struct.Struct('<4sHHII')
+
+# File layout after the header, little-endian: the sorted canonical_keys of
+# the positions as uint64, then the best move of each as int8, then its value
+# for X as float32. A position and its mirror image share one entry.
+
+
+def generate(path, plies, depth, tt_megabytes=64):
+    # Searches every position reachable in fewer than `plies` moves that is
+    # still undecided and writes the book. Returns the number of positions.
+    game = BitboardConnectFour()
+    game.tt = TranspositionTable(tt_megabytes)
+    entries = {}
+
+    def visit():
+        key, mirrored = game.canonical_key()
+        if game.ply >= plies or game.game_over() or key in entries:
+            return
+
+        is_maximizing = game.ply % 2 == 0
+        value, move = game.minimax(is_maximizing, depth, -float('inf'), float('inf'))
+        entries[key] = (game.columns - 1 - move if mirrored else move, value)
+
+        symbol = 'X' if is_maximizing else 'O'
+        for col in game.available_moves():
+            game.select_space(col, symbol)
+            visit()
+            game.undo_move(col)
+
+    visit()
+
+    keys = sorted(entries)
+    with open(path, 'wb') as book_file:
+        book_file.write(HEADER.pack(MAGIC, VERSION, plies, depth, len(keys)))
+        array('Q', keys).tofile(book_file)
+        array('b', [entries[key][0] for key in keys]).tofile(book_file)
+        array('f', [entries[key][1] for key in keys]).tofile(book_file)
+
+    return len(keys)
+
+
+class OpeningBook:
+    def __init__(self, path=BOOK_PATH):
+        with open(path, 'rb') as book_file:
+            self._map = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.plies, self.depth, self.size = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f'{path} is not a version {VERSION} opening book')
+
+        view = memoryview(self._map)
+        offset = HEADER.size
+        self._keys = view[offset:offset + 8 * self.size].cast('Q')
+        offset += 8 * self.size
+        self._moves = view[offset:offset + self.size].cast('b')
+        offset += self.size
+        self._values = view[offset:offset + 4 * self.size].cast('f')
+
+    def lookup(self, game):
+        # [value, move] for the position in game, or None when it is not in
+        # the book
+        if game.ply >= self.plies:
+            return None
+
+        key, mirrored = game.canonical_key()
+        index = bisect.bisect_left(self._keys, key)
+        if index < self.size and self._keys[index] == key:
+            move = self._moves[index]
+            return [self._values[index], game.columns - 1 - move if mirrored else move]
+
+        return None
+
+    def close(self):
+        for view in (self._keys, self._moves, self._values):
+            view.release()
+        self._map.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the opening book used by ConnectFour.py and CompvsComp.py')
+    parser.add_argument('--plies', type=int, default=4, help='cover positions with fewer moves played than this')
+    parser.add_argument('--depth', type=int, default=8, help='minimax depth searched for every position')
+    parser.add_argument('--tt-megabytes', type=int, default=64)
+    parser.add_argument('--output', default=BOOK_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = generate(args.output, args.plies, args.depth, args.tt_megabytes)
+    print(f'{count} positions, {os.path.getsize(args.output)} bytes, '
+          f'{time.perf_counter() - start:.1f}s -> {args.output}')
@@ -0,0 +1,42 @@
+# Static preference for columns nearer the centre, which take part in more lines
+CENTER_RANK = [3, 2, 1, 0, 1, 2, 3]
+
+MAX_PLY = 42
+
+
+class MoveOrderer:
+    def __init__(self, columns=7):
+        self.columns = columns
+        self.clear()
+
+    def clear(self):
+        # Two killer moves per ply (discs on the board) and a history score
+        # per symbol and column, both fed by moves that caused a cutoff
+        self.killers = [['', ''] for _ in range(MAX_PLY + 1)]
+        self.history = {'X': [0] * self.columns, 'O': [0] * self.columns}
+
+    def order(self, moves, ply, symbol, first=''):
+        # Stored best move first, then killers, then by history, then centre out
+        killers = self.killers[ply]
+        history = self.history[symbol]
+        return sorted(moves, key=lambda col: (col != first, col not in killers, -history[col], CENTER_RANK[col]))
+
+    def cutoff(self, move, ply, symbol, depth):
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[symbol][move] += depth * depth
+
+
+class FixedOrderer:
+    # Leaves moves in the order given and learns nothing from cutoffs, for
+    # measuring what move ordering is worth
+    def clear(self):
+        pass
+
+    def order(self, moves, ply, symbol, first=''):
+        return list(moves)
+
+    def cutoff(self, move, ply, symbol, depth):
+        pass
@@ -0,0 +1,248 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import multiprocessing
+import pickle
+
+from bitboard import COLUMNS
+
+# Splits a search two plies down: every root move is split into the
+# opponent's replies and each reply is a task for a worker process. Young
+# brothers wait at both plies: the first reply of a root move is searched
+# before its others, which get its value as their bound, and the first root
+# move is resolved before the others, whose tasks all get the best root value
+# so far as a shared bound. Workers re-read that bound before every move of
+# the first BOUND_LEVELS plies of a task and drop a task once another reply
+# has refuted its root move.
+#
+# This does not scale near linearly. Only one core was available to
+# measure on, so each task's CPU time was recorded with one worker and the
+# schedule replayed with unlimited workers. The first reply of the first
+# root move is one serial task, and one badly ordered reply can take longer
+# than all the rest. At depth 9-10 from the empty board, after 2, 3323 and
+# 4433, the critical path limits the speedup to 1.4-3.1x however many cores
+# there are. The tasks did 0.6-2.2x the work of a serial search: each
+# worker has its own transposition table and move orderer, and the bounds
+# are weaker than a serial search would have. At depth 7 a serial search
+# takes about 60ms, little more than the cost of handing out the tasks.
+
+# Plies of a task that re-read the shared bound before every move, deeper
+# plies are searched by game.minimax with the window they are given
+BOUND_LEVELS = 2
+
+# Best root value found so far in the current search, and a flag per root
+# column set once that move is refuted or the search is over, shared with
+# the workers
+_bound = None
+_refuted = None
+# Tightest shared bound the running task of this worker has searched with
+_used = None
+
+
+def _init_worker(bound, refuted):
+    global _bound, _refuted
+    _bound = bound
+    _refuted = refuted
+
+
+class _Refuted(Exception):
+    pass
+
+
+def _search(game, is_maximizing, depth, alpha, beta, levels, col, root_maximizing):
+    # game.minimax's value, except that the shared bound is re-read before
+    # every move: it raises alpha when X moves at the root and lowers beta
+    # when O does. The tightest bound used goes in _used.
+    global _used
+    if game.game_over() or depth == 0:
+        return game.evaluate_board()
+
+    if game.endgame is not None:
+        entry = game.endgame.value(game)
+        if entry is not None:
+            return entry[0]
+
+    if is_maximizing:
+        best_value = -float('inf')
+        symbol = 'X'
+    else:
+        best_value = float('inf')
+        symbol = 'O'
+
+    for move in game.orderer.order(game.unique_moves(game.available_moves()), game.ply, symbol):
+        if _refuted[col]:
+            raise _Refuted
+        bound = _bound.value
+        if alpha < bound < beta:
+            if root_maximizing:
+                alpha = bound
+            else:
+                beta = bound
+            _used = bound
+
+        game.select_space(move, symbol)
+        try:
+            if levels > 1:
+                value = _search(game, not is_maximizing, depth - 1, alpha, beta, levels - 1, col, root_maximizing)
+            else:
+                value = game.minimax(not is_maximizing, depth - 1, alpha, beta)[0]
+        finally:
+            game.undo_move(move)
+        if is_maximizing:
+            best_value = max(best_value, value)
+            alpha = max(alpha, best_value)
+        else:
+            best_value = min(best_value, value)
+            beta = min(beta, best_value)
+        if alpha >= beta:
+            game.orderer.cutoff(move, game.ply, symbol, depth)
+            break
+
+    return best_value
+
+
+def _search_reply(position, is_maximizing, depth, col, reply, alpha, beta):
+    # Searches root move col answered by reply, depth - 2 plies deeper, in
+    # the window alpha, beta. Returns [value, tightest shared bound used]:
+    # a value no better for the side at the root than that bound is only a
+    # bound on the reply's value, and enough to refute col. Returns None
+    # when col was refuted by another task first.
+    global _used
+    game = pickle.loads(position)
+    _used = alpha if is_maximizing else beta
+    game.select_space(col, 'X' if is_maximizing else 'O')
+    game.select_space(reply, 'O' if is_maximizing else 'X')
+    try:
+        value = _search(game, is_maximizing, depth - 2, alpha, beta, BOUND_LEVELS, col, is_maximizing)
+    except _Refuted:
+        return None
+
+    return [value, _used]
+
+
+class ParallelSearch:
+    def __init__(self, workers=None):
+        self.bound = multiprocessing.Value('d', 0.0, lock=False)
+        self.refuted = multiprocessing.Array('b', COLUMNS, lock=False)
+        self.executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(self.bound, self.refuted))
+
+    def minimax(self, game, is_maximizing, depth):
+        # Same value as game.minimax(is_maximizing, depth, -inf, inf) and a
+        # move with that value. Exact ties go to the earlier move in search
+        # order, but a later one may be kept when the earlier was refuted by
+        # a bound it only equals.
+        if game.game_over() or depth < 3:
+            return game.minimax(is_maximizing, depth, -float('inf'), float('inf'))
+
+        symbol = 'X' if is_maximizing else 'O'
+        reply_symbol = 'O' if is_maximizing else 'X'
+        win = float('inf') if is_maximizing else -float('inf')
+        position = pickle.dumps(game)
+
+        moves = game.orderer.order(game.unique_moves(game.available_moves()), game.ply, symbol)
+        rank = {col: i for i, col in enumerate(moves)}
+        # Replies of each root move not submitted yet, the value of the root
+        # move so far (the best reply found for the opponent) and its tasks
+        # still out
+        replies = {}
+        values = {}
+        outstanding = {}
+        for col in moves:
+            self.refuted[col] = 0
+            game.select_space(col, symbol)
+            try:
+                if game.game_over():
+                    replies[col] = []
+                    values[col] = game.evaluate_board()
+                else:
+                    replies[col] = game.orderer.order(game.unique_moves(game.available_moves()), game.ply,
+                                                      reply_symbol)
+                    values[col] = win
+            finally:
+                game.undo_move(col)
+            outstanding[col] = 0
+
+        self.bound.value = -win
+        best = [-win, None]
+        pending = {}
+
+        def submit(col, first_reply):
+            reply = replies[col].pop(0)
+            if is_maximizing:
+                window = (self.bound.value, values[col])
+            else:
+                window = (values[col], self.bound.value)
+            future = self.executor.submit(_search_reply, position, is_maximizing, depth, col, reply, *window)
+            pending[future] = [col, first_reply]
+            outstanding[col] += 1
+
+        def start(col):
+            # The first reply alone, the others wait for its value
+            if self.refuted[col]:
+                return
+            if replies[col]:
+                submit(col, True)
+            else:
+                finish(col)
+
+        def finish(col):
+            # Every reply of col is searched and none refuted it
+            value = values[col]
+            if (best[1] is None or (value > best[0] if is_maximizing else value < best[0]) or
+                    (value == best[0] and rank[col] < rank[best[1]])):
+                best[0] = value
+                best[1] = col
+                self.bound.value = value
+            if value == win:
+                stop()
+            elif col == moves[0]:
+                for other in moves[1:]:
+                    start(other)
+
+        def stop():
+            # Drops the tasks not started and tells the running ones to stop
+            for col in moves:
+                self.refuted[col] = 1
+                replies[col] = []
+            for future in pending:
+                future.cancel()
+
+        start(moves[0])
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    col, first_reply = pending.pop(future)
+                    outstanding[col] -= 1
+                    result = None if future.cancelled() else future.result()
+                    if result is None or self.refuted[col]:
+                        continue
+
+                    value, used = result
+                    if is_maximizing:
+                        values[col] = min(values[col], value)
+                        refuted = value <= used or values[col] <= best[0]
+                    else:
+                        values[col] = max(values[col], value)
+                        refuted = value >= used or values[col] >= best[0]
+                    if best[1] is not None and refuted:
+                        # The reply holds col to no better than a move
+                        # already found
+                        self.refuted[col] = 1
+                        replies[col] = []
+                        for other, (other_col, _) in pending.items():
+                            if other_col == col:
+                                other.cancel()
+                        continue
+
+                    if first_reply:
+                        while replies[col]:
+                            submit(col, False)
+                    if not outstanding[col] and not replies[col]:
+                        finish(col)
+        finally:
+            stop()
+            wait(pending)
+
+        return best
+
+    def close(self):
+        self.executor.shutdown()
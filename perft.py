@@ -0,0 +1,81 @@
+import argparse
+import sys
+import time
+
+from bench import ENGINES
+
+# Leaf counts from the empty board by depth. Won positions are leaves and
+# are not searched further, so the counts drop below 7 ** depth from depth
+# 7 on, and column overflow already removes 7 sequences at depth 7.
+EXPECTED = [1, 7, 49, 343, 2401, 16807, 117649, 823536, 5686266, 39452034]
+
+
+def perft(game, depth):
+    # Number of positions depth moves from game, counting a won position as
+    # a leaf wherever it is reached
+    if depth == 0 or game.winner is not None:
+        return 1
+
+    symbol = 'X' if game.ply % 2 == 0 else 'O'
+    count = 0
+    for col in game.available_moves():
+        game.select_space(col, symbol)
+        try:
+            count += perft(game, depth - 1)
+        finally:
+            game.undo_move(col)
+
+    return count
+
+
+def divide(game, depth):
+    # perft of each move from game, {column: count}, for narrowing down where
+    # two implementations disagree
+    symbol = 'X' if game.ply % 2 == 0 else 'O'
+    counts = {}
+    for col in game.available_moves():
+        game.select_space(col, symbol)
+        try:
+            counts[col] = perft(game, depth - 1)
+        finally:
+            game.undo_move(col)
+
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Count the positions reachable from a position to check and time move generation')
+    parser.add_argument('depth', type=int)
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument('--moves', default='', help='columns played from the empty board, X first')
+    parser.add_argument('--divide', action='store_true', help='print the count below every move')
+    parser.add_argument('--time', action='store_true', help='time every depth up to depth and print positions/sec')
+    args = parser.parse_args()
+
+    failed = False
+    for name in args.engines:
+        game = ENGINES[name]()
+        for move in args.moves:
+            game.select_space(int(move), 'X' if game.ply % 2 == 0 else 'O')
+
+        if args.divide:
+            for col, count in divide(game, args.depth).items():
+                print(f'{name} {col}: {count}')
+
+        for depth in range(1 if args.time else args.depth, args.depth + 1):
+            start = time.perf_counter()
+            count = perft(game, depth)
+            seconds = time.perf_counter() - start
+
+            line = f'{name} depth {depth}: {count}'
+            if args.time:
+                line += f' in {seconds:.3f}s, {count / seconds:,.0f} positions/s'
+            if not args.moves and depth < len(EXPECTED):
+                if count == EXPECTED[depth]:
+                    line += ' ok'
+                else:
+                    line += f' expected {EXPECTED[depth]}'
+                    failed = True
+            print(line, flush=True)
+
+    sys.exit(1 if failed else 0)
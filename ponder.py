@@ -0,0 +1,62 @@
+from copy import deepcopy
+
+from background import BackgroundTask
+from search import SearchTimeout
+
+
+class Ponderer:
+    # Searches the computer's answer to every human move on a background
+    # thread while the human is thinking. The searches deepen one depth at a
+    # time over all the replies, most likely first, so every reply is covered
+    # before any goes deeper. The transposition table keeps what they find
+    # for the real search.
+    def __init__(self, game, is_maximizing, max_depth=None):
+        self.game = deepcopy(game)
+        self.is_maximizing = is_maximizing
+        if max_depth is None:
+            max_depth = game.rows * game.columns - game.ply - 1
+        # Human move -> [depth, [value, move]] of the deepest finished search
+        self.results = {}
+        self._task = BackgroundTask(self._run, max_depth)
+
+    def _run(self, max_depth):
+        game = self.game
+        human = 'O' if self.is_maximizing else 'X'
+        replies = game.orderer.order(game.available_moves(), game.ply, human)
+        try:
+            for depth in range(1, max_depth + 1):
+                for reply in replies:
+                    game.select_space(reply, human)
+                    try:
+                        if game.game_over():
+                            continue
+                        result = game.minimax(self.is_maximizing, depth, -float('inf'), float('inf'))
+                    finally:
+                        game.undo_move(reply)
+                    self.results[reply] = [depth, result]
+        except SearchTimeout:
+            pass
+
+    def stop(self, move):
+        # Stops pondering and returns [depth, [value, move]] searched for the
+        # human's move, or None when it was not reached
+        self.game.deadline = 0
+        self._task.result()
+        return self.results.get(move)
+
+
+class TreePonderer:
+    # Pondering for MCTS: grows the search tree from the position the human
+    # is to move in, and the computer's search then carries on from the node
+    # of the move the human played
+    def __init__(self, tree_search, game, is_maximizing, playouts=200000):
+        self.tree_search = tree_search
+        tree_search.deadline = None
+        self._task = BackgroundTask(tree_search.search, deepcopy(game), not is_maximizing, None, playouts)
+
+    def stop(self, move):
+        # Same as Ponderer.stop, but the work is in the tree so there is
+        # never a result to hand back
+        self.tree_search.deadline = 0
+        self._task.result()
+        return None
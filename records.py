@@ -0,0 +1,184 @@
+import argparse
+import mmap
+import os
+import struct
+
+from engine import BitboardConnectFour
+
+MAGIC = b'C4GR'
+VERSION = 1
+# magic, version, games between index entries
+HEADER = struct.Struct('<4sHH')
+# games, settings table offset, index offset, end magic
+TRAILER = struct.Struct('<QQQ4s')
+END_MAGIC = b'C4GE'
+
+INDEX_STRIDE = 64
+RESULTS = ['', 'X', 'O', None]
+
+# File layout, little-endian: the header, then one record per game, then the
+# settings table, the index and the trailer, which the writer rewrites on
+# close. A record is a byte holding the result (0 draw, 1 X won, 2 O won,
+# 3 unfinished) in its top two bits and the number of moves below, a byte
+# with the game's entry in the settings table, and the columns played at 3
+# bits each, first move in the lowest bits. The settings table is a uint16
+# count and a uint16 length and UTF-8 text for each entry. The index holds
+# the offset of every INDEX_STRIDE-th record as uint64.
+
+
+def encode_game(moves, result, settings_id):
+    packed = 0
+    for i, move in enumerate(moves):
+        packed |= move << 3 * i
+    head = bytes([RESULTS.index(result) << 6 | len(moves), settings_id])
+    return head + packed.to_bytes((3 * len(moves) + 7) // 8, 'little')
+
+
+def decode_game(data, offset):
+    # [moves, result, settings id, offset of the next record] for the record
+    # at offset
+    count = data[offset] & 0x3F
+    result = RESULTS[data[offset] >> 6]
+    settings_id = data[offset + 1]
+    start = offset + 2
+    end = start + (3 * count + 7) // 8
+    packed = int.from_bytes(data[start:end], 'little')
+    moves = [packed >> 3 * i & 7 for i in range(count)]
+    return [moves, result, settings_id, end]
+
+
+def _read_footer(data, path):
+    magic, version, stride = HEADER.unpack_from(data)
+    games, settings_offset, index_offset, end_magic = TRAILER.unpack_from(data, len(data) - TRAILER.size)
+    if magic != MAGIC or version != VERSION or end_magic != END_MAGIC:
+        raise ValueError(f'{path} is not a closed version {VERSION} game record file')
+
+    settings = []
+    offset = settings_offset + 2
+    for _ in range(struct.unpack_from('<H', data, settings_offset)[0]):
+        length = struct.unpack_from('<H', data, offset)[0]
+        settings.append(bytes(data[offset + 2:offset + 2 + length]).decode())
+        offset += 2 + length
+
+    index = list(struct.unpack_from(f'<{(games + stride - 1) // stride}Q', data, index_offset))
+    return [games, stride, settings_offset, settings, index]
+
+
+class GameWriter:
+    # Appends games to a record file, creating it if needed. The settings
+    # table and index are held in memory and written by close().
+    def __init__(self, path):
+        self.path = path
+        self.games = 0
+        self.settings = []
+        self.index = []
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._file = open(path, 'r+b')
+            with mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self.games, stride, settings_offset, self.settings, self.index = _read_footer(data, path)
+            if stride != INDEX_STRIDE:
+                raise ValueError(f'{path} is indexed every {stride} games, not {INDEX_STRIDE}')
+            self._file.seek(settings_offset)
+            self._file.truncate()
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(HEADER.pack(MAGIC, VERSION, INDEX_STRIDE))
+
+    def add(self, moves, result, settings=''):
+        # result is the winner, '' for a draw or None when unfinished;
+        # settings is free text describing the players, at most 256 kinds
+        # per file
+        if settings not in self.settings:
+            if len(self.settings) == 256:
+                raise ValueError('a record file holds at most 256 different settings')
+            self.settings.append(settings)
+
+        if self.games % INDEX_STRIDE == 0:
+            self.index.append(self._file.tell())
+        self._file.write(encode_game(moves, result, self.settings.index(settings)))
+        self.games += 1
+
+    def close(self):
+        settings_offset = self._file.tell()
+        self._file.write(struct.pack('<H', len(self.settings)))
+        for settings in self.settings:
+            text = settings.encode()
+            self._file.write(struct.pack('<H', len(text)) + text)
+        index_offset = self._file.tell()
+        self._file.write(struct.pack(f'<{len(self.index)}Q', *self.index))
+        self._file.write(TRAILER.pack(self.games, settings_offset, index_offset, END_MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GameReader:
+    # Memory-mapped record file. Games decode as [moves, result, settings]
+    # when iterated or indexed; indexing decodes at most INDEX_STRIDE records.
+    def __init__(self, path):
+        with open(path, 'rb') as record_file:
+            self._map = mmap.mmap(record_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.size, self.stride, self._end, self.settings, self._index = _read_footer(self._map, path)
+        except (ValueError, struct.error):
+            self._map.close()
+            raise
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, number):
+        if number < 0:
+            number += self.size
+        if not 0 <= number < self.size:
+            raise IndexError('game number out of range')
+
+        offset = self._index[number // self.stride]
+        for _ in range(number % self.stride):
+            offset = decode_game(self._map, offset)[3]
+        moves, result, settings_id, _ = decode_game(self._map, offset)
+        return [moves, result, self.settings[settings_id]]
+
+    def __iter__(self):
+        offset = HEADER.size
+        for _ in range(self.size):
+            moves, result, settings_id, offset = decode_game(self._map, offset)
+            yield [moves, result, self.settings[settings_id]]
+
+    def close(self):
+        self._map.close()
+
+
+def replay(moves, engine_class=BitboardConnectFour):
+    # A game with moves played from the empty board, X first
+    game = engine_class()
+    for move in moves:
+        game.select_space(move, 'X' if game.ply % 2 == 0 else 'O')
+
+    return game
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarize or print the games in a game record file')
+    parser.add_argument('path')
+    parser.add_argument('--show', type=int, default=None, metavar='N', help='replay game N and print its board')
+    args = parser.parse_args()
+
+    reader = GameReader(args.path)
+    if args.show is not None:
+        moves, result, settings = reader[args.show]
+        print(f'{settings}: {"".join(map(str, moves))}')
+        replay(moves).print_board()
+    else:
+        totals = {}
+        for moves, result, settings in reader:
+            totals[result] = totals.get(result, 0) + 1
+        print(f'{len(reader)} games, {os.path.getsize(args.path)} bytes')
+        for result, label in (('X', 'X wins'), ('O', 'O wins'), ('', 'draws'), (None, 'unfinished')):
+            print(f'{label}: {totals.get(result, 0)}')
+    reader.close()
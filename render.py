@@ -0,0 +1,104 @@
+import pygame
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+DISC_COLOURS = {'X': (255, 0, 0), 'O': (255, 255, 0)}
+WIN_MESSAGES = {'X': 'Red wins!', 'O': 'Yellow wins!', '': "It's a Tie"}
+
+
+def _button(font, text, size, center):
+    # White button with its label, and the rect it is drawn at
+    button = pygame.Surface(size)
+    button.fill('White')
+    label = font.render(text, True, BLACK)
+    button.blit(label, label.get_rect(center=(size[0] // 2, size[1] // 2)))
+    return button, button.get_rect(center=center)
+
+
+class Renderer:
+    # Draws the GUI from surfaces rendered once up front, and only sends the
+    # parts of the window that changed to the display, so a screen that is
+    # not changing costs next to nothing per frame
+    def __init__(self, win, button_font, win_msg_font, title_font):
+        self.win = win
+        self.dirty = []
+        # Screen on display: 'start', 'game' or 'over'
+        self.screen = None
+
+        self.start_screen = pygame.Surface(win.get_size())
+        title = title_font.render('Connect Four', True, WHITE)
+        self.start_screen.blit(title, title.get_rect(center=(600, 200)))
+        self.start_buttons = {}
+        for name, text, width, y in (('pvp', 'Vs. Player', 250, 375),
+                                     ('red', 'Vs. Comp as Red', 350, 475),
+                                     ('yellow', 'Vs. Comp as Yellow', 400, 575)):
+            button, rect = _button(button_font, text, (width, 65), (600, y))
+            self.start_screen.blit(button, rect)
+            self.start_buttons[name] = rect
+
+        self.grid = pygame.Surface(win.get_size(), pygame.SRCALPHA)
+        for i in range(1, 9):
+            pygame.draw.line(self.grid, WHITE, (i * 100, 100), (i * 100, 700), 4)
+        pygame.draw.line(self.grid, WHITE, (100, 700), (800, 700), 4)
+
+        self.win_messages = {}
+        for symbol, text in WIN_MESSAGES.items():
+            message = win_msg_font.render(text, True, WHITE)
+            self.win_messages[symbol] = [message, message.get_rect(center=(1000, 200))]
+        self.over_buttons = {}
+        self.over_surfaces = []
+        for name, text, width, y in (('restart', 'Restart', 175, 350), ('main_menu', 'Main Menu', 250, 425)):
+            button, rect = _button(button_font, text, (width, 50), (1000, y))
+            self.over_surfaces.append([button, rect])
+            self.over_buttons[name] = rect
+
+        self.thinking = button_font.render('Thinking...', True, WHITE)
+        self.thinking_rect = self.thinking.get_rect(center=(1000, 200))
+
+    def show_start_screen(self):
+        if self.screen != 'start':
+            self.win.blit(self.start_screen, (0, 0))
+            self.dirty.append(self.win.get_rect())
+            self.screen = 'start'
+
+    def show_game_screen(self):
+        self.win.fill(BLACK)
+        self.win.blit(self.grid, (0, 0))
+        self.dirty.append(self.win.get_rect())
+        self.screen = 'game'
+
+    def show_win_message(self, winning_symbol):
+        if self.screen != 'over':
+            message, rect = self.win_messages[winning_symbol]
+            self.win.blit(message, rect)
+            self.dirty.append(rect)
+            for button, rect in self.over_surfaces:
+                self.win.blit(button, rect)
+                self.dirty.append(rect)
+            self.screen = 'over'
+
+    def draw_disc(self, symbol, position):
+        self.dirty.append(pygame.draw.circle(self.win, DISC_COLOURS[symbol], position, 43))
+
+    def draw_thinking(self, thinking):
+        if thinking:
+            self.win.blit(self.thinking, self.thinking_rect)
+        else:
+            self.win.fill(BLACK, self.thinking_rect)
+        self.dirty.append(self.thinking_rect)
+
+    def clicked(self, buttons):
+        # Name of the button in buttons, a {name: rect} dict, under a held
+        # mouse button, or None
+        if pygame.mouse.get_pressed()[0]:
+            mouse_pos = pygame.mouse.get_pos()
+            for name, rect in buttons.items():
+                if rect.collidepoint(mouse_pos):
+                    return name
+
+        return None
+
+    def flush(self):
+        if self.dirty:
+            pygame.display.update(self.dirty)
+            self.dirty = []
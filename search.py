@@ -0,0 +1,73 @@
+import random
+import time
+
+from transposition import TranspositionTable
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def random_tie_break(game, is_maximizing, depth, result):
+    # Picks at random among the root moves scoring exactly the value of the
+    # [value, move] result minimax returned for this depth. Each other move
+    # gets a narrow window search around that value. Wins and losses are
+    # returned as they are.
+    value, move = result
+    if abs(value) == float('inf'):
+        return result
+
+    symbol = 'X' if is_maximizing else 'O'
+    ties = [move]
+    for col in range(game.columns):
+        if col == move or not game.select_space(col, symbol):
+            continue
+        try:
+            score = game.minimax(not is_maximizing, depth - 1, value - 0.5, value + 0.5)[0]
+        finally:
+            game.undo_move(col)
+        if score == value:
+            ties.append(col)
+
+    return [value, random.choice(ties)]
+
+
+def iterative_deepening(game, is_maximizing, time_budget, max_depth=None, random_ties=False):
+    # Searches depth 1, 2, 3, ... until time_budget seconds have passed and
+    # returns [value, move] from the deepest search that finished. The
+    # transposition table hands each iteration the previous best move first.
+    if max_depth is None:
+        max_depth = sum(cell == ' ' for row in game.board for cell in row)
+
+    own_tt = game.tt is None
+    if own_tt:
+        game.tt = TranspositionTable(1)
+
+    try:
+        # Depth 1 always completes so there is a move to play
+        result = game.minimax(is_maximizing, 1, -float('inf'), float('inf'))
+        completed = 1
+        game.deadline = time.perf_counter() + time_budget
+
+        for depth in range(2, max_depth + 1):
+            if abs(result[0]) == float('inf'):
+                break
+            try:
+                result = game.minimax(is_maximizing, depth, -float('inf'), float('inf'))
+            except SearchTimeout:
+                break
+            completed = depth
+
+        if game.stats is not None:
+            game.stats.depth = completed
+
+        if random_ties:
+            # Runs past the deadline, but the table already holds most of it
+            game.deadline = None
+            result = random_tie_break(game, is_maximizing, completed, result)
+    finally:
+        game.deadline = None
+        if own_tt:
+            del game.tt
+
+    return result
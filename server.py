@@ -0,0 +1,291 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from analyze import analyze_position, init_worker
+from bitboard import COLUMN_HEIGHT, COLUMN_NAMES, COLUMNS, ROWS, won
+
+# Line protocol, one command per line, every reply naming its game:
+#   NEW [depth [seconds]]  -> GAME <id>
+#   PLAY <id> <column>     -> MOVE <id> <column> for the engine's answer
+#   GO <id>                -> MOVE <id> <column>, the engine moves now
+#   SHOW <id>              -> POSITION <id> <columns played>
+#   QUIT <id>              -> CLOSED <id>
+#   STATS                  -> STATS with session counts and move latencies
+# A move that ends the game is followed by OVER <id> X, O or DRAW, and a bad
+# command is answered with ERROR <reason>. Columns are 0-6.
+
+
+class Session:
+    # A game is only the columns played so far, the position is rebuilt
+    # from them whenever it is needed
+    __slots__ = ('moves', 'depth', 'time_budget', 'busy')
+
+    def __init__(self, depth, time_budget):
+        self.moves = ''
+        self.depth = depth
+        self.time_budget = time_budget
+        # Whether an engine search for this game is running
+        self.busy = False
+
+    def play(self, column):
+        # Plays column for the side to move; returns the winner, 'DRAW',
+        # '' when the game goes on, or None when column cannot be played
+        if column not in range(COLUMNS) or self.result() or self.moves.count(str(column)) == ROWS:
+            return None
+
+        self.moves += str(column)
+        return self.result()
+
+    def result(self):
+        masks = [0, 0]
+        heights = [0] * COLUMNS
+        for ply, move in enumerate(self.moves):
+            col = int(move)
+            masks[ply % 2] |= 1 << (col * COLUMN_HEIGHT + heights[col])
+            heights[col] += 1
+
+        if won(masks[0]):
+            return 'X'
+        if won(masks[1]):
+            return 'O'
+        if len(self.moves) == ROWS * COLUMNS:
+            return 'DRAW'
+
+        return ''
+
+
+class GameServer:
+    def __init__(self, workers=None, max_pending=None, depth=6, time_budget=0.1, tt_megabytes=4, latency_window=10000,
+                 max_depth=10, max_time=2.0):
+        workers = workers or os.cpu_count() or 1
+        self.depth = depth
+        self.time_budget = time_budget
+        # Most a client may ask for with NEW, so no game can hold a worker
+        # for long
+        self.max_depth = max_depth
+        self.max_time = max_time
+        self.executor = ProcessPoolExecutor(workers, initializer=init_worker,
+                                            initargs=(depth, time_budget, tt_megabytes))
+        # Searches waiting for or running in the pool. A connection waiting
+        # for a free slot stops reading, so clients feel the back-pressure.
+        self.slots = asyncio.Semaphore(max_pending or 4 * workers)
+        self.sessions = 0
+        self.next_id = 0
+        # Seconds from a move request arriving to the answer being sent
+        self.latencies = deque(maxlen=latency_window)
+        self.moves = 0
+
+    async def handle(self, reader, writer):
+        sessions = {}
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                words = line.decode(errors='replace').split()
+                if not words:
+                    continue
+
+                reply = self.command(words, sessions)
+                if isinstance(reply, Session):
+                    # A search is due: wait for a pool slot before reading on
+                    await self.slots.acquire()
+                    task = asyncio.create_task(self.engine_move(words, reply, writer, time.perf_counter()))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif reply:
+                    writer.write(reply.encode())
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.sessions -= len(sessions)
+            writer.close()
+
+    def command(self, words, sessions):
+        # Answers a command straight away as the reply text, or returns the
+        # session the engine has to move in
+        name = words[0].upper()
+        try:
+            if name == 'NEW':
+                depth = int(words[1]) if len(words) > 1 else self.depth
+                time_budget = float(words[2]) if len(words) > 2 else self.time_budget
+                if not 1 <= depth <= self.max_depth:
+                    return f'ERROR depth must be 1-{self.max_depth}\n'
+                # 0 searches depth without a time limit
+                if time_budget is not None and not 0 <= time_budget <= self.max_time:
+                    return f'ERROR seconds must be 0-{self.max_time:g}\n'
+                self.next_id += 1
+                sessions[self.next_id] = Session(depth, time_budget)
+                self.sessions += 1
+                return f'GAME {self.next_id}\n'
+
+            if name == 'STATS':
+                return self.stats() + '\n'
+
+            session = sessions.get(int(words[1])) if len(words) > 1 else None
+        except ValueError:
+            return 'ERROR bad number\n'
+
+        if name not in ('PLAY', 'GO', 'SHOW', 'QUIT'):
+            return f'ERROR unknown command {words[0]}\n'
+        if session is None:
+            return 'ERROR no such game\n'
+        game_id = words[1]
+
+        if name == 'SHOW':
+            return f'POSITION {game_id} {session.moves}\n'
+        if name == 'QUIT':
+            del sessions[int(game_id)]
+            self.sessions -= 1
+            return f'CLOSED {game_id}\n'
+        if session.busy:
+            return f'ERROR {game_id} engine is still moving\n'
+
+        if name == 'PLAY':
+            if len(words) < 3 or words[2] not in COLUMN_NAMES:
+                return f'ERROR {game_id} bad column\n'
+            result = session.play(int(words[2]))
+            if result is None:
+                return f'ERROR {game_id} column {words[2]} cannot be played\n'
+            if result:
+                return f'OVER {game_id} {result}\n'
+        elif session.result():
+            return f'ERROR {game_id} game is over\n'
+
+        session.busy = True
+        return session
+
+    async def engine_move(self, words, session, writer, start):
+        # Searches in the pool, plays the answer and sends it. The caller
+        # took a pool slot, released here.
+        game_id = words[1]
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, analyze_position, session.moves,
+                                                session.depth, session.time_budget)
+            move = result.get('move')
+            over = session.play(move)
+            if over is None:
+                reply = f'ERROR {game_id} {result.get("error", "the engine found no move")}\n'
+            else:
+                reply = f'MOVE {game_id} {move}\n'
+                if over:
+                    reply += f'OVER {game_id} {over}\n'
+            writer.write(reply.encode())
+            self.latencies.append(time.perf_counter() - start)
+            self.moves += 1
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            session.busy = False
+            self.slots.release()
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        fields = [f'sessions={self.sessions}', f'moves={self.moves}']
+        if latencies:
+            for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+                fields.append(f'{name}={latencies[int(fraction * (len(latencies) - 1))] * 1000:.1f}ms')
+            fields.append(f'max={latencies[-1] * 1000:.1f}ms')
+
+        return 'STATS ' + ' '.join(fields)
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+async def load_test(host, port, games, connections, seed=0):
+    # Plays games concurrently over a few connections, the client moving
+    # at random, and returns the server's STATS line
+    rng = random.Random(seed)
+
+    async def play_games(count):
+        reader, writer = await asyncio.open_connection(host, port)
+        for _ in range(count):
+            writer.write(b'NEW\n')
+        await writer.drain()
+
+        games = {}
+        finished = 0
+        while finished < count:
+            words = (await reader.readline()).decode().split()
+            if words[0] == 'ERROR':
+                raise RuntimeError(' '.join(words))
+            if words[0] == 'OVER':
+                finished += 1
+                continue
+
+            if words[0] == 'GAME':
+                games[words[1]] = game = Session(None, None)
+            else:
+                game = games[words[1]]
+                if game.play(int(words[2])):
+                    # OVER follows
+                    continue
+
+            column = rng.choice([col for col in range(COLUMNS) if game.moves.count(str(col)) < ROWS])
+            game.play(column)
+            writer.write(f'PLAY {words[1]} {column}\n'.encode())
+            await writer.drain()
+
+        writer.write(b'STATS\n')
+        await writer.drain()
+        stats = (await reader.readline()).decode().strip()
+        writer.close()
+        return stats
+
+    start = time.perf_counter()
+    counts = [games // connections + (i < games % connections) for i in range(connections)]
+    results = await asyncio.gather(*(play_games(count) for count in counts if count))
+    elapsed = time.perf_counter() - start
+    return results[-1], elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve many Connect Four games over a TCP line protocol')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--workers', type=int, default=None, help='engine processes, one per CPU by default')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='searches queued or running before connections stop being read, 4 per worker by default')
+    parser.add_argument('--depth', type=int, default=6, help='default search depth of a game')
+    parser.add_argument('--time', type=float, default=0.1, help='default seconds per engine move, 0 for fixed depth')
+    parser.add_argument('--max-depth', type=int, default=10, help='deepest search a client may ask for')
+    parser.add_argument('--max-time', type=float, default=2.0, help='most seconds per move a client may ask for')
+    parser.add_argument('--load-test', type=int, default=0, metavar='GAMES',
+                        help='play this many games against a running server instead of serving')
+    parser.add_argument('--connections', type=int, default=10, help='client connections for --load-test')
+    args = parser.parse_args()
+
+    if args.load_test:
+        stats, elapsed = asyncio.run(load_test(args.host, args.port, args.load_test, args.connections))
+        print(f'{args.load_test} games in {elapsed:.1f}s, {args.load_test / elapsed:.1f} games/s')
+        print(stats)
+    else:
+        async def main():
+            game_server = GameServer(args.workers, args.max_pending, args.depth, args.time or None,
+                                     max_depth=args.max_depth, max_time=args.max_time)
+            try:
+                await game_server.serve(args.host, args.port)
+            finally:
+                game_server.close()
+
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,174 @@
+from bitboard import BOARD_MASK, BOTTOM_MASK, COLUMN_HEIGHT, COLUMNS, ROWS, Bitboard, board_masks, position_key
+from transposition import LOWER, UPPER, TranspositionTable
+
+# Scores follow the usual solver convention, from the side to move: 0 is a
+# draw, a win with the player's k-th from last possible disc scores k, so
+# faster wins score higher, and losses are the negated opponent's score.
+CELLS = ROWS * COLUMNS
+
+COLUMN_ORDER = [3, 2, 4, 1, 5, 0, 6]
+COLUMN_MASKS = [((1 << ROWS) - 1) << (col * COLUMN_HEIGHT) for col in range(COLUMNS)]
+
+
+def winning_cells(position, mask):
+    # Empty cells that would complete a line of four for the discs in position
+    # Vertical
+    cells = (position << 1) & (position << 2) & (position << 3)
+
+    # Horizontal and both diagonals
+    for shift in (COLUMN_HEIGHT, COLUMN_HEIGHT - 1, COLUMN_HEIGHT + 1):
+        pair = (position << shift) & (position << 2 * shift)
+        cells |= pair & (position << 3 * shift)
+        cells |= pair & (position >> shift)
+        pair = (position >> shift) & (position >> 2 * shift)
+        cells |= pair & (position << shift)
+        cells |= pair & (position >> 3 * shift)
+
+    return cells & (BOARD_MASK ^ mask)
+
+
+def playable_cells(mask):
+    return (mask + BOTTOM_MASK) & BOARD_MASK
+
+
+def non_losing_moves(current, mask):
+    # Playable cells that do not hand the opponent an immediate win: when the
+    # opponent threatens to win it must be blocked, and no disc may be played
+    # directly below an opponent winning cell
+    playable = playable_cells(mask)
+    opponent_wins = winning_cells(current ^ mask, mask)
+    forced = playable & opponent_wins
+    if forced:
+        if forced & (forced - 1):
+            return 0
+        playable = forced
+
+    return playable & ~(opponent_wins >> 1)
+
+
+def score_to_result(score, ply):
+    # [winner, plies left] for a score of the position ply discs into the game;
+    # the winner is 'X', 'O' or '' for a draw
+    if score == 0:
+        return ['', CELLS - ply]
+
+    mover = 'X' if ply % 2 == 0 else 'O'
+    opponent = 'O' if mover == 'X' else 'X'
+    winner = mover if score > 0 else opponent
+
+    # The winning disc is number CELLS + 1 - 2 * |score| or one after it,
+    # whichever the winner places
+    final = CELLS + 1 - 2 * abs(score)
+    if (final - 1) % 2 != (ply if winner == mover else ply + 1) % 2:
+        final += 1
+
+    return [winner, final - ply]
+
+
+class Solver:
+    def __init__(self, tt_megabytes=64):
+        self.tt = TranspositionTable(tt_megabytes)
+        self.nodes = 0
+
+    def _negamax(self, current, mask, moves, alpha, beta):
+        # The side to move has no immediate win here
+        self.nodes += 1
+        candidates = non_losing_moves(current, mask)
+        if not candidates:
+            return -((CELLS - moves) // 2)
+
+        if moves >= CELLS - 2:
+            return 0
+
+        lowest = -((CELLS - 2 - moves) // 2)
+        if alpha < lowest:
+            alpha = lowest
+            if alpha >= beta:
+                return alpha
+
+        highest = (CELLS - 1 - moves) // 2
+        key = position_key(current, mask ^ current)
+        entry = self.tt.lookup(key)
+        if entry is not None:
+            value, _, bound, _ = entry
+            if bound == UPPER:
+                highest = min(highest, int(value))
+            elif bound == LOWER:
+                alpha = max(alpha, int(value))
+        if beta > highest:
+            beta = highest
+        if alpha >= beta:
+            return alpha
+
+        # Moves creating the most winning cells first, then nearest the centre
+        ordered = []
+        for col in COLUMN_ORDER:
+            move = candidates & COLUMN_MASKS[col]
+            if move:
+                threats = winning_cells(current | move, mask).bit_count()
+                ordered.append((-threats, len(ordered), move))
+        ordered.sort()
+
+        alpha_orig = alpha
+        for _, _, move in ordered:
+            score = -self._negamax(current ^ mask, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                self.tt.store(key, CELLS - moves, alpha_orig, beta, score, '')
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.tt.store(key, CELLS - moves, alpha, float('inf'), alpha, '')
+        return alpha
+
+    def score(self, game):
+        # Exact score of the position for the side to move
+        if isinstance(game, Bitboard):
+            x, o = game.masks['X'], game.masks['O']
+        else:
+            x, o = board_masks(game.board)
+        mask = x | o
+        moves = mask.bit_count()
+        current = x if moves % 2 == 0 else o
+
+        if winning_cells(current, mask) & playable_cells(mask):
+            return (CELLS + 1 - moves) // 2
+
+        # Null window searches narrow [lowest, highest] down to the score,
+        # probing nearer zero first where most positions lie
+        lowest = -((CELLS - moves) // 2)
+        highest = (CELLS + 1 - moves) // 2
+        while lowest < highest:
+            middle = lowest + (highest - lowest) // 2
+            if middle <= 0 and int(lowest / 2) < middle:
+                middle = int(lowest / 2)
+            elif middle >= 0 and int(highest / 2) > middle:
+                middle = int(highest / 2)
+            result = self._negamax(current, mask, moves, middle, middle + 1)
+            if result <= middle:
+                highest = result
+            else:
+                lowest = result
+
+        return lowest
+
+    def solve(self, game):
+        # [winner, plies until the game ends] with perfect play from both
+        # sides; the winner is 'X', 'O', or '' for a draw
+        if game.winner is not None:
+            return [game.winner, 0]
+        if game.board_full():
+            return ['', 0]
+
+        return score_to_result(self.score(game), game.ply)
+
+
+_solver = None
+
+
+def solve(game):
+    global _solver
+    if _solver is None:
+        _solver = Solver()
+
+    return _solver.solve(game)
@@ -0,0 +1,96 @@
+import json
+import time
+
+
+def json_number(value):
+    # JSON has no infinity, proven wins and losses are written as strings
+    if value is not None and abs(value) == float('inf'):
+        return 'inf' if value > 0 else '-inf'
+
+    return value
+
+
+class SearchStats:
+    def __init__(self):
+        self.root_ply = 0
+        # Nodes visited at each ply below the root
+        self.nodes = []
+        self.leaf_evals = 0
+        self.cutoffs = 0
+        # Cutoffs caused by the first move searched, a measure of ordering
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.start_time = None
+        self.elapsed = 0
+        # Deepest search completed, set by iterative deepening
+        self.depth = None
+        self.value = None
+        self.pv = []
+
+    def start(self, game):
+        self.root_ply = game.ply
+        self.start_time = time.perf_counter()
+
+    def visit(self, ply):
+        ply -= self.root_ply
+        while len(self.nodes) <= ply:
+            self.nodes.append(0)
+        self.nodes[ply] += 1
+
+    def finish(self, game, is_maximizing, result):
+        # Records the elapsed time and the [value, move] result with the
+        # principal variation that follows it in the transposition table
+        self.elapsed = time.perf_counter() - self.start_time
+        self.value = result[0]
+        self.pv = principal_variation(game, is_maximizing, result[1])
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else None
+
+    def to_dict(self):
+        return {
+            'ply': self.root_ply,
+            'depth': self.depth,
+            'value': json_number(self.value),
+            'pv': self.pv,
+            'elapsed': self.elapsed,
+            'nodes': sum(self.nodes),
+            'nodes_per_ply': self.nodes,
+            'nodes_per_second': sum(self.nodes) / self.elapsed if self.elapsed else None,
+            'leaf_evals': self.leaf_evals,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoff_rate': self.first_move_cutoff_rate(),
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+        }
+
+    def write(self, path):
+        # Appends the stats as one JSON line
+        with open(path, 'a') as stats_file:
+            stats_file.write(json.dumps(self.to_dict()) + '\n')
+
+
+def principal_variation(game, is_maximizing, move):
+    # move followed by the best moves stored in the transposition table for
+    # the positions it leads to, until one is missing
+    if move == '':
+        return []
+
+    pv = []
+    while move != '' and move in game.available_moves() and len(pv) < 42:
+        game.select_space(move, 'X' if is_maximizing else 'O')
+        pv.append(move)
+        is_maximizing = not is_maximizing
+        if game.tt is None or game.game_over():
+            break
+        key, mirrored = game.tt_key(is_maximizing)
+        entry = game.tt.lookup(key)
+        move = entry[3] if entry is not None else ''
+        if mirrored and move != '':
+            move = game.columns - 1 - move
+
+    for col in reversed(pv):
+        game.undo_move(col)
+
+    return pv
@@ -0,0 +1,264 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import math
+import random
+import time
+
+from engine import BitboardConnectFour, BitboardRandomEvalConnectFour
+from mcts import MCTS
+from ordering import FixedOrderer
+from records import GameWriter
+from search import iterative_deepening
+from transposition import TranspositionTable
+
+EVALUATORS = ['streaks', 'random']
+SEARCHES = ['minimax', 'mcts']
+
+
+class Player:
+    def __init__(self, depth=4, evaluator='streaks', ordering=True, time_budget=None, tt_megabytes=16,
+                 search='minimax', playouts=None):
+        if evaluator not in EVALUATORS:
+            raise ValueError(f'unknown evaluator {evaluator!r}, expected one of {", ".join(EVALUATORS)}')
+        if search not in SEARCHES:
+            raise ValueError(f'unknown search {search!r}, expected one of {", ".join(SEARCHES)}')
+        self.depth = depth
+        self.evaluator = evaluator
+        self.ordering = ordering
+        # Seconds per move for iterative deepening up to depth, None searches
+        # depth straight away
+        self.time_budget = time_budget
+        self.tt_megabytes = tt_megabytes
+        self.search = search
+        # Playout budget per move of MCTS, which needs this or time_budget
+        if search == 'mcts' and playouts is None and time_budget is None:
+            playouts = 1000
+        self.playouts = playouts
+
+    @classmethod
+    def parse(cls, spec):
+        # 'depth=6,eval=random,ordering=off,time=0.1,tt=0' or
+        # 'search=mcts,playouts=2000'; unset keys keep their defaults
+        settings = {}
+        for item in filter(None, spec.split(',')):
+            name, _, value = item.partition('=')
+            if name == 'depth':
+                settings['depth'] = int(value)
+            elif name == 'eval':
+                settings['evaluator'] = value
+            elif name == 'ordering':
+                settings['ordering'] = value not in ('off', 'no', '0')
+            elif name == 'time':
+                settings['time_budget'] = float(value) or None
+            elif name == 'tt':
+                settings['tt_megabytes'] = int(value)
+            elif name == 'search':
+                settings['search'] = value
+            elif name == 'playouts':
+                settings['playouts'] = int(value)
+            else:
+                raise ValueError(f'unknown player setting {name!r}')
+
+        return cls(**settings)
+
+    def __str__(self):
+        if self.search == 'mcts':
+            settings = ['search=mcts']
+            if self.playouts:
+                settings.append(f'playouts={self.playouts}')
+        else:
+            settings = [f'depth={self.depth}', f'eval={self.evaluator}',
+                        f'ordering={"on" if self.ordering else "off"}', f'tt={self.tt_megabytes}']
+        if self.time_budget:
+            settings.append(f'time={self.time_budget:g}')
+        return ','.join(settings)
+
+    def new_game(self, seat):
+        # A fresh game carrying this player's search state for seat, 0 for
+        # X and 1 for O. The transposition table is kept per worker process
+        # and cleared per game, and every game has its own move orderer, so
+        # every game is played from the same start.
+        if self.search == 'mcts':
+            tree_search = _search_state.get((str(self), seat))
+            if tree_search is None:
+                tree_search = _search_state[(str(self), seat)] = MCTS()
+            tree_search.clear()
+            # Seeded from the game's seed so matches can be replayed
+            tree_search.rng.seed(random.getrandbits(64))
+            return BitboardConnectFour()
+
+        game = BitboardRandomEvalConnectFour() if self.evaluator == 'random' else BitboardConnectFour()
+
+        tt = _search_state.get((str(self), seat))
+        if tt is None and self.tt_megabytes:
+            tt = _search_state[(str(self), seat)] = TranspositionTable(self.tt_megabytes)
+        if tt is not None:
+            tt.clear()
+
+        game.tt = tt
+        if not self.ordering:
+            game.orderer = FixedOrderer()
+        return game
+
+    def choose_move(self, game, is_maximizing, seat):
+        if self.search == 'mcts':
+            return _search_state[(str(self), seat)].search(game, is_maximizing, self.time_budget, self.playouts)[1]
+        if self.time_budget:
+            return iterative_deepening(game, is_maximizing, self.time_budget, self.depth)[1]
+
+        return game.minimax(is_maximizing, self.depth, -float('inf'), float('inf'))[1]
+
+
+# Transposition table, or MCTS tree, of each player in
+# this process, keyed by the player's settings and seat so a player never
+# shares them with an identical opponent
+_search_state = {}
+
+
+def play_game(first, second, random_plies, seed, moves=None, clocks=None):
+    # Plays one game, first as X, and returns 1, 0.5 or 0 for first. Both
+    # players keep their own copy of the position so neither sees the
+    # other's tables; the opening moves are random so games differ. The
+    # columns played are appended to moves when it is given, and the CPU
+    # seconds and moves of each player are added to clocks, a pair of
+    # [seconds, moves] for first and second.
+    rng = random.Random(seed)
+    random.seed(seed)
+    games = [first.new_game(0), second.new_game(1)]
+    players = [first, second]
+
+    while True:
+        mover = games[0].ply % 2
+        is_maximizing = mover == 0
+        if games[0].ply < random_plies:
+            move = rng.choice(games[0].available_moves())
+        else:
+            start = time.process_time()
+            move = players[mover].choose_move(games[mover], is_maximizing, mover)
+            if clocks is not None:
+                clocks[mover][0] += time.process_time() - start
+                clocks[mover][1] += 1
+
+        symbol = 'X' if is_maximizing else 'O'
+        for game in games:
+            game.select_space(move, symbol)
+        if moves is not None:
+            moves.append(move)
+
+        if games[0].winner is not None:
+            return 1 if games[0].winner == 'X' else 0
+        if games[0].board_full():
+            return 0.5
+
+
+def _play_pair_game(args):
+    # Game number index of a match: the players swap colours every game.
+    # Returns [score for A, columns played, clocks of A and B].
+    player_a, player_b, random_plies, seed, index = args
+    moves = []
+    clocks = [[0, 0], [0, 0]]
+    if index % 2 == 0:
+        return [play_game(player_a, player_b, random_plies, seed + index // 2, moves, clocks), moves, clocks]
+
+    score = play_game(player_b, player_a, random_plies, seed + index // 2, moves, clocks)
+    return [1 - score, moves, clocks[::-1]]
+
+
+def elo_difference(score):
+    if score <= 0:
+        return -float('inf')
+    if score >= 1:
+        return float('inf')
+
+    return -400 * math.log10(1 / score - 1)
+
+
+def match_summary(results):
+    # Wins, draws and losses for player A, their Elo difference over B, and
+    # the 95% confidence interval of it from the spread of the game scores
+    games = len(results)
+    wins = results.count(1)
+    draws = results.count(0.5)
+    losses = games - wins - draws
+
+    score = sum(results) / games
+    variance = sum((result - score) ** 2 for result in results) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    return {
+        'games': games,
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'score': score,
+        'elo': elo_difference(score),
+        'elo_low': elo_difference(score - margin),
+        'elo_high': elo_difference(score + margin),
+    }
+
+
+def run_match(player_a, player_b, games, workers=None, random_plies=4, seed=0, chunksize=4, record=None):
+    # Plays games between the two players across a pool of worker processes.
+    # Each pair of games shares an opening with the colours swapped. Returns
+    # match_summary with games_per_second and each player's CPU milliseconds
+    # per move added. With record set to a path every game is appended to
+    # that game record file as well.
+    tasks = [(player_a, player_b, random_plies, seed, index) for index in range(games)]
+    writer = GameWriter(record) if record else None
+    sides = [f'X: {player_a} / O: {player_b}', f'X: {player_b} / O: {player_a}']
+
+    start = time.perf_counter()
+    results = []
+    clocks = [[0, 0], [0, 0]]
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            for index, (result, moves, game_clocks) in enumerate(executor.map(_play_pair_game, tasks,
+                                                                              chunksize=chunksize)):
+                results.append(result)
+                for clock, game_clock in zip(clocks, game_clocks):
+                    clock[0] += game_clock[0]
+                    clock[1] += game_clock[1]
+                if writer is not None:
+                    # Turn A's score back into the winner's symbol
+                    score = result if index % 2 == 0 else 1 - result
+                    winner = '' if score == 0.5 else 'X' if score == 1 else 'O'
+                    writer.add(moves, winner, sides[index % 2])
+    finally:
+        if writer is not None:
+            writer.close()
+    elapsed = time.perf_counter() - start
+
+    summary = match_summary(results)
+    summary['seconds'] = elapsed
+    summary['games_per_second'] = games / elapsed
+    for name, (seconds, moves) in zip(('a', 'b'), clocks):
+        summary[f'ms_per_move_{name}'] = 1000 * seconds / moves if moves else None
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play engine settings against each other and estimate the Elo difference')
+    parser.add_argument('--a', default='', help="player A settings, e.g. 'depth=6,eval=streaks,ordering=on,time=0.1,tt=16' "
+                                          "or 'search=mcts,playouts=2000'")
+    parser.add_argument('--b', default='eval=random', help='player B settings, same form as --a')
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, one per CPU by default')
+    parser.add_argument('--random-plies', type=int, default=4, help='random opening moves of each pair of games')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--record', default=None, metavar='PATH', help='append every game to this game record file')
+    args = parser.parse_args()
+
+    player_a = Player.parse(args.a)
+    player_b = Player.parse(args.b)
+    summary = run_match(player_a, player_b, args.games, args.workers, args.random_plies, args.seed,
+                        record=args.record)
+
+    for name, player in (('a', player_a), ('b', player_b)):
+        # None when every move of the player was a random opening move
+        ms_per_move = summary[f'ms_per_move_{name}']
+        ms_text = 'n/a' if ms_per_move is None else f'{ms_per_move:.1f}'
+        print(f'{name.upper()}: {player} ({ms_text} CPU ms/move)')
+    print(f'{summary["games"]} games: +{summary["wins"]} ={summary["draws"]} -{summary["losses"]} '
+          f'(score {summary["score"]:.3f})')
+    print(f'Elo A - B: {summary["elo"]:+.0f} [{summary["elo_low"]:+.0f}, {summary["elo_high"]:+.0f}] 95%')
+    print(f'{summary["games_per_second"]:.2f} games/s over {summary["seconds"]:.1f}s')
@@ -0,0 +1,86 @@
+from array import array
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Bytes held per entry: key, value, depth, bound and move
+ENTRY_BYTES = 8 + 8 + 1 + 1 + 1
+
+# Mixed into the position hash when the maximizing player is the one to move
+SIDE_KEY = 0x9E3779B97F4A7C15
+
+
+class TranspositionTable:
+    def __init__(self, megabytes=16):
+        # Two slots per bucket: the first keeps the deepest search seen for
+        # the bucket, the second always takes the latest store
+        buckets = 1
+        while buckets * 4 * ENTRY_BYTES <= megabytes * 1024 * 1024:
+            buckets *= 2
+        self.bucket_mask = buckets - 1
+        self.size = buckets * 2
+
+        self.keys = array('Q', bytes(8 * self.size))
+        self.values = array('d', bytes(8 * self.size))
+        self.depths = array('b', [-1]) * self.size
+        self.bounds = array('b', bytes(self.size))
+        self.moves = array('b', [-1]) * self.size
+
+    def clear(self):
+        self.keys = array('Q', bytes(8 * self.size))
+        self.depths = array('b', [-1]) * self.size
+
+    def _find(self, key):
+        slot = (key & self.bucket_mask) * 2
+        if self.keys[slot] == key and self.depths[slot] >= 0:
+            return slot
+        if self.keys[slot + 1] == key and self.depths[slot + 1] >= 0:
+            return slot + 1
+
+        return -1
+
+    def lookup(self, key):
+        slot = self._find(key)
+        if slot == -1:
+            return None
+
+        return self.values[slot], self.depths[slot], self.bounds[slot], self.moves[slot]
+
+    def probe(self, key, depth, alpha, beta):
+        # Returns [value, move]; value is None unless the stored result is deep
+        # enough to settle the (alpha, beta) window, move is '' when unknown
+        slot = self._find(key)
+        if slot == -1:
+            return [None, '']
+
+        move = self.moves[slot]
+        if move == -1:
+            move = ''
+
+        if self.depths[slot] >= depth:
+            value = self.values[slot]
+            bound = self.bounds[slot]
+            if bound == EXACT or (bound == LOWER and value >= beta) or (bound == UPPER and value <= alpha):
+                return [value, move]
+
+        return [None, move]
+
+    def store(self, key, depth, alpha, beta, value, move):
+        # alpha and beta are the window the node was searched with
+        if value <= alpha:
+            bound = UPPER
+        elif value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+
+        slot = (key & self.bucket_mask) * 2
+        if self.keys[slot] != key and depth < self.depths[slot]:
+            slot += 1
+
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.depths[slot] = depth
+        self.bounds[slot] = bound
+        self.moves[slot] = -1 if move == '' else move